@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from bisect import bisect
+from itertools import accumulate
+from timeit import default_timer
+
+import knn_example
+import naive_bayes_example
+import robust_naive_bayes_example
+"""
+A repeatable performance benchmark for the example classifiers. It doesn't need train.json: recipes
+are made up by generate_recipes, which picks ingredients from a Zipf distribution (a few ingredients
+like salt are in almost every recipe, most are rare, just like the real data) with each cuisine
+favouring its own set of ingredients. The same seed always gives the same recipes.
+
+For each number of recipes it times (and, unless told not to, measures the memory used by):
+
+	load_data         reading the recipes with json.load
+	nb_train          naive_bayes_example.get_cuisine_probs + get_ingredient_prob_given_cuisine
+	nb_predict        naive_bayes_example.get_max_cuisine on the held out recipes
+	robust_nb_train   robust_naive_bayes_example training (including collecting all_ingredients)
+	knn_predict       knn_example.get_max_cuisine on a few held out recipes
+
+and writes the results to a JSON file. Run it before and after a change and use compare to see what
+got faster or slower:
+
+	python benchmark_suite.py --scales 10000 100000 1000000 --output before.json
+	python benchmark_suite.py --scales 10000 100000 1000000 --output after.json --compare before.json
+"""
+
+"""
+Input:
+	num_recipes -> number of recipes to make
+	vocab_size -> number of different ingredients
+	num_cuisines -> number of different cuisines
+	mean_length -> average number of ingredients per recipe
+	zipf_exponent -> how skewed ingredient popularity is (the i-th most popular ingredient has weight 1/i^zipf_exponent)
+	seed -> random seed
+Output:
+	A generator of recipes in the same form as train.json: {'id': ..., 'cuisine': ..., 'ingredients': [...]}
+"""
+def generate_recipes(num_recipes, vocab_size=6000, num_cuisines=20, mean_length=10, zipf_exponent=1.0, seed=0):
+	rng = random.Random(seed)
+	ingredients = ['ingredient %d' % i for i in range(vocab_size)]
+	cuisines = ['cuisine %d' % i for i in range(num_cuisines)]
+	popularity = [1.0/(i + 1)**zipf_exponent for i in range(vocab_size)]
+
+	# Each cuisine uses its own 2% of the ingredients 20 times as often as usual
+	cumulative_weights = []
+	for _ in cuisines:
+		weights = list(popularity)
+		for i in rng.sample(range(vocab_size), max(1, vocab_size//50)):
+			weights[i] *= 20
+		cumulative_weights.append(list(accumulate(weights)))
+	# Some cuisines are more common than others too
+	cuisine_weights = list(accumulate(1.0/(i + 1)**0.7 for i in range(num_cuisines)))
+
+	for recipe_id in range(num_recipes):
+		label = bisect(cuisine_weights, rng.random()*cuisine_weights[-1])
+		weights = cumulative_weights[label]
+		length = min(vocab_size, max(1, int(round(rng.gauss(mean_length, mean_length/3.0)))))
+		chosen = set()
+		while len(chosen) < length:
+			chosen.add(bisect(weights, rng.random()*weights[-1]))
+		yield {'id': recipe_id, 'cuisine': cuisines[label], 'ingredients': [ingredients[i] for i in chosen]}
+
+"""
+Writes recipes (a list or generator) to filename as one JSON list, without holding them all in memory.
+"""
+def write_recipes(recipes, filename):
+	with open(filename, 'w') as out:
+		out.write('[\n')
+		for i, recipe in enumerate(recipes):
+			out.write((',\n' if i else '') + json.dumps(recipe))
+		out.write('\n]\n')
+
+"""
+Runs stage() once to time it and, if measure_memory, once more under tracemalloc to find the most memory
+it allocated at any point (peak_bytes) and how much of that it still holds when it finishes (retained_bytes).
+"""
+def measure(stage, measure_memory=True):
+	wall_start = default_timer()
+	cpu_start = time.process_time()
+	stage()
+	result = {'wall_time': default_timer() - wall_start, 'cpu_time': time.process_time() - cpu_start}
+	if measure_memory:
+		tracemalloc.start()
+		kept = stage()
+		result['retained_bytes'], result['peak_bytes'] = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		del kept
+	return result
+
+def _train_robust(train_data):
+	cuisine_probs = robust_naive_bayes_example.get_cuisine_probs(train_data)
+	all_cuisines = [cuisine for cuisine in cuisine_probs]
+	all_ingredients = set()
+	for recipe in train_data:
+		for ingredient in recipe['ingredients']:
+			all_ingredients.add(ingredient)
+	return cuisine_probs, robust_naive_bayes_example.get_ingredient_prob_given_cuisine(train_data, all_cuisines, all_ingredients)
+
+"""
+Runs every stage on num_recipes generated recipes. The last num_queries recipes are held out and
+classified by naive bayes; only the last knn_queries of them are classified by kNN, since every kNN
+query scans the whole training set. num_recipes has to be bigger than num_queries, or there's nothing
+left to train on.
+"""
+def benchmark_scale(num_recipes, workdir, num_queries=1000, knn_queries=20, measure_memory=True, k=6, **generator_args):
+	_check_scales([num_recipes], num_queries)
+	filename = os.path.join(workdir, 'recipes_%d.json' % num_recipes)
+	write_recipes(generate_recipes(num_recipes, **generator_args), filename)
+
+	data = naive_bayes_example.load_data(filename)
+	train_data = data[:-num_queries]
+	queries = [recipe['ingredients'] for recipe in data[-num_queries:]]
+	# Not queries[-knn_queries:], which would be all of them for knn_queries=0
+	knn_queries = queries[len(queries) - knn_queries:]
+	cuisine_probs = naive_bayes_example.get_cuisine_probs(train_data)
+	ingredient_prob_given_cuisine = naive_bayes_example.get_ingredient_prob_given_cuisine(train_data)
+
+	def prepare_knn():
+		# knn_example wants sets; converting in place (after naive bayes is done) saves a second copy of the data
+		knn_example.make_ingredient_list_into_set(train_data)
+
+	stages = [
+		('load_data', num_recipes, None, lambda: naive_bayes_example.load_data(filename)),
+		('nb_train', len(train_data), None, lambda: (naive_bayes_example.get_cuisine_probs(train_data),
+			naive_bayes_example.get_ingredient_prob_given_cuisine(train_data))),
+		('nb_predict', len(queries), None, lambda: [naive_bayes_example.get_max_cuisine(ingredients, cuisine_probs, ingredient_prob_given_cuisine)
+			for ingredients in queries]),
+		('robust_nb_train', len(train_data), None, lambda: _train_robust(train_data)),
+		('knn_predict', len(knn_queries), prepare_knn, lambda: [knn_example.get_max_cuisine(ingredients, train_data, k) for ingredients in knn_queries]),
+	]
+
+	results = []
+	for name, items, setup, stage in stages:
+		if setup:
+			setup()
+		result = measure(stage, measure_memory)
+		result.update({'scale': num_recipes, 'stage': name, 'items': items, 'time_per_item': result['wall_time']/items if items else 0.0})
+		results.append(result)
+		print('%8d recipes  %-16s %9.3fs  %10.1fus/item%s' % (num_recipes, name, result['wall_time'], result['time_per_item']*1e6,
+			'  peak %.1f MB' % (result['peak_bytes']/1e6) if measure_memory else ''))
+	os.remove(filename)
+	return results
+
+def _check_scales(scales, num_queries):
+	too_small = [scale for scale in scales if scale <= num_queries]
+	if too_small:
+		raise ValueError('every scale must be bigger than num_queries (%d) to leave recipes to train on, got %s' % (num_queries,
+			', '.join(str(scale) for scale in too_small)))
+
+"""
+Runs benchmark_scale for every scale and returns (and optionally writes to output) the full report.
+"""
+def run(scales=(10000, 100000, 1000000), output=None, seed=0, vocab_size=6000, num_cuisines=20, mean_length=10,
+		zipf_exponent=1.0, num_queries=1000, knn_queries=20, measure_memory=True):
+	# Check them all before spending time on the first one
+	_check_scales(scales, num_queries)
+	config = {'scales': list(scales), 'seed': seed, 'vocab_size': vocab_size, 'num_cuisines': num_cuisines, 'mean_length': mean_length,
+		'zipf_exponent': zipf_exponent, 'num_queries': num_queries, 'knn_queries': knn_queries, 'measure_memory': measure_memory}
+	report = {'config': config, 'environment': {'python': platform.python_version(), 'platform': platform.platform()}, 'results': []}
+
+	workdir = tempfile.mkdtemp()
+	try:
+		for num_recipes in scales:
+			report['results'].extend(benchmark_scale(num_recipes, workdir, num_queries, knn_queries, measure_memory, seed=seed,
+				vocab_size=vocab_size, num_cuisines=num_cuisines, mean_length=mean_length, zipf_exponent=zipf_exponent))
+	finally:
+		shutil.rmtree(workdir)
+
+	if output:
+		with open(output, 'w') as out:
+			json.dump(report, out, indent=2, sort_keys=True)
+	return report
+
+"""
+Prints how every (scale, stage) in report changed compared to baseline (both results of run, or the
+names of the JSON files they were written to). A ratio above 1 means it got slower.
+"""
+def compare(report, baseline):
+	if not isinstance(report, dict):
+		with open(report) as report_file:
+			report = json.load(report_file)
+	if not isinstance(baseline, dict):
+		with open(baseline) as baseline_file:
+			baseline = json.load(baseline_file)
+
+	before = {(result['scale'], result['stage']): result for result in baseline['results']}
+	changes = []
+	for result in report['results']:
+		old = before.get((result['scale'], result['stage']))
+		if old is None:
+			continue
+		change = {'scale': result['scale'], 'stage': result['stage'], 'time_ratio': result['wall_time']/old['wall_time']}
+		if 'peak_bytes' in result and 'peak_bytes' in old:
+			change['memory_ratio'] = result['peak_bytes']/float(old['peak_bytes'] or 1)
+		changes.append(change)
+		print('%8d recipes  %-16s time x%.2f%s' % (change['scale'], change['stage'], change['time_ratio'],
+			'  memory x%.2f' % change['memory_ratio'] if 'memory_ratio' in change else ''))
+	return changes
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmark the example classifiers on generated recipes.')
+	parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000, 1000000])
+	parser.add_argument('--output', default='benchmark_results.json')
+	parser.add_argument('--compare', help='earlier results file to compare against')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--vocab-size', type=int, default=6000)
+	parser.add_argument('--cuisines', type=int, default=20)
+	parser.add_argument('--mean-length', type=int, default=10)
+	parser.add_argument('--zipf-exponent', type=float, default=1.0)
+	parser.add_argument('--queries', type=int, default=1000)
+	parser.add_argument('--knn-queries', type=int, default=20)
+	parser.add_argument('--no-memory', action='store_true', help="don't measure memory (about twice as fast)")
+	args = parser.parse_args(argv)
+	if min(args.scales) <= args.queries:
+		parser.error('every scale must be bigger than --queries (%d)' % args.queries)
+
+	report = run(args.scales, args.output, args.seed, args.vocab_size, args.cuisines, args.mean_length, args.zipf_exponent,
+		args.queries, args.knn_queries, not args.no_memory)
+	if args.compare:
+		compare(report, args.compare)
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import sys
+import unicodedata
+from timeit import default_timer
+
+import robust_naive_bayes_example
+from fused_trainer import NaiveBayesTrainer
+from naive_bayes_example import load_data, eval_classifier
+"""
+Every classifier uses the ingredient strings exactly as they're written, so "large eggs", "eggs" and
+"Eggs" are three different ingredients. The robust model has a probability for every ingredient and
+every cuisine, so each spelling costs a whole column of the table, and a test recipe that spells an
+ingredient a new way gets it ignored as unseen.
+
+canonicalize turns an ingredient into a standard form:
+
+	unicode      accents are dropped ("crème fraîche" -> "creme fraiche"), apostrophes dropped
+	case         everything is lower case
+	punctuation  anything that isn't a letter, digit or space goes (including the ® and ™ of brand names)
+	qualifiers   size and preparation words ("large", "fresh", "chopped", ...) and common brand names go
+	plurals      every word is made singular with a few simple rules ("tomatoes" -> "tomato")
+
+so "Large Eggs" and "eggs" both become "egg". The rules are plain string work, but there's no point
+doing them again for an ingredient we've already seen, so the answers go into a table (a dictionary
+from raw string to canonical string). Save the table with save_table after training and load it with
+load_table before predicting: the same strings always get the same answer, and strings seen during
+training cost one dictionary lookup.
+
+	table = load_table('canonical.json')
+	trainer = NaiveBayesTrainer().fit(canonicalize_recipes(train_data, table))
+	save_table(table, 'canonical.json')
+	cuisine = get_max_cuisine(ingredients, cuisine_probs, ingredient_prob_given_cuisine, table)
+"""
+
+# Bump this whenever the rules change, so tables saved with the old rules get thrown away
+VERSION = 2
+
+QUALIFIERS = set('''
+	large small medium extra jumbo big baby whole fresh freshly chopped minced diced sliced thinly finely
+	coarsely grated shredded crushed cubed halved peeled pitted packed organic natural pure premium
+	'''.split())
+
+BRANDS = ['old el paso', 'taco bell', 'bertolli', 'knorr', 'pillsbury', 'kraft', 'sargento', 'swanson', 'hellmanns',
+	'uncle bens', 'country crock', 'red gold', 'mccormick', 'progresso', 'crisco', 'johnsonville', 'gold medal',
+	'land o lakes', 'philadelphia', 'green giant', 'ragu', 'hidden valley', 'wish bone', 'zatarains']
+
+_BRANDS = re.compile(r'\b(%s)\b' % '|'.join(re.escape(brand) for brand in BRANDS))
+_NOT_WORD = re.compile(r'[^a-z0-9 ]+')
+# Trademark signs go before unicode normalisation, which would turn them into letters
+_MARKS = re.compile(u'[\u00ae\u2122\u00a9]')
+
+# Words that end like plurals but aren't
+NOT_PLURAL = set(['molasses', 'grits', 'hummus', 'couscous', 'asparagus', 'swiss'])
+
+"""
+Returns the singular form of word, by a few rules that are right for most ingredient names.
+"""
+def singular(word):
+	if len(word) <= 3 or word in NOT_PLURAL or word.endswith(('ss', 'us', 'is')):
+		return word
+	if word.endswith('ies'):
+		return word[:-3] + 'y'
+	if word.endswith(('oes', 'ches', 'shes', 'xes')):
+		return word[:-2]
+	if word.endswith('s'):
+		return word[:-1]
+	return word
+
+"""
+Returns the canonical form of an ingredient string (see the top of the file). If stripping brand names
+or qualifiers would leave nothing ("Pillsbury", "fresh"), they're kept.
+"""
+def canonicalize(ingredient):
+	text = unicodedata.normalize('NFKD', _MARKS.sub('', ingredient))
+	text = ''.join(character for character in text if not unicodedata.combining(character))
+	# "sheep's milk" -> "sheeps milk", which becomes "sheep milk" below
+	text = text.lower().replace(u'\u2019', '').replace("'", '')
+	text = _NOT_WORD.sub(' ', text)
+	words = _BRANDS.sub(' ', text).split() or text.split()
+	kept = [word for word in words if word not in QUALIFIERS] or words
+	return ' '.join(singular(word) for word in kept)
+
+"""
+Returns the canonical forms of a recipe's ingredients, looking them up in table. Ingredients that end up
+the same are only listed once, like the ingredients of a recipe.
+
+With grow=True (training) the ones that aren't in the table are added to it. At prediction time pass
+grow=False: they're canonicalized without being added, so a long-running predictor doesn't fill the
+table with every new string it's asked about.
+"""
+def canonicalize_ingredients(ingredients, table, grow=True):
+	canonical = []
+	seen = set()
+	for ingredient in ingredients:
+		name = table.get(ingredient)
+		if name is None:
+			name = canonicalize(ingredient)
+			if grow:
+				table[ingredient] = name
+		if name not in seen:
+			seen.add(name)
+			canonical.append(name)
+	return canonical
+
+"""
+Yields a copy of each recipe with its ingredients canonicalized. Works on lists and on iterators like
+streaming_loader.iter_recipes, so it can go straight into any of the training functions.
+"""
+def canonicalize_recipes(recipes, table):
+	for recipe in recipes:
+		recipe = dict(recipe)
+		recipe['ingredients'] = canonicalize_ingredients(recipe['ingredients'], table)
+		yield recipe
+
+def save_table(table, filename):
+	with open(filename, 'w') as out:
+		json.dump({'version': VERSION, 'table': table}, out, sort_keys=True)
+
+"""
+Loads a table written by save_table. Returns an empty table if the file doesn't exist or was written with
+different rules.
+"""
+def load_table(filename):
+	if not os.path.exists(filename):
+		return {}
+	with open(filename) as table_file:
+		saved = json.load(table_file)
+	if saved.get('version') != VERSION:
+		return {}
+	return saved['table']
+
+"""
+Same as robust_naive_bayes_example.get_max_cuisine, but canonicalizes the ingredients first. table is
+only read, never added to.
+"""
+def get_max_cuisine(ingredient_list, cuisine_probs, ingredient_prob_given_cuisine, table):
+	return robust_naive_bayes_example.get_max_cuisine(canonicalize_ingredients(ingredient_list, table, grow=False), cuisine_probs,
+		ingredient_prob_given_cuisine)
+
+"""
+Prints how much canonicalizing shrinks the vocabulary of a recipe file (which doesn't need cuisines, so
+data/test.json works) and how long building the table takes compared to using it once it's built.
+"""
+def vocabulary_report(filename):
+	data = load_data(filename)
+	raw = set(ingredient for recipe in data for ingredient in recipe['ingredients'])
+
+	table = {}
+	start = default_timer()
+	canonical = set(ingredient for recipe in canonicalize_recipes(data, table) for ingredient in recipe['ingredients'])
+	cold_time = default_timer() - start
+	start = default_timer()
+	for recipe in canonicalize_recipes(data, table):
+		pass
+	warm_time = default_timer() - start
+
+	print('%d ingredients -> %d (%.1f%% fewer)' % (len(raw), len(canonical), 100.0*(len(raw) - len(canonical))/len(raw)))
+	print('canonicalizing %d recipes: %.3fs building the table, %.3fs with it built' % (len(data), cold_time, warm_time))
+	return {'raw_vocabulary': len(raw), 'canonical_vocabulary': len(canonical), 'cold_time': cold_time, 'warm_time': warm_time}
+
+def _dense_size(ingredient_prob_given_cuisine):
+	return sum(sys.getsizeof(probs) for probs in ingredient_prob_given_cuisine.values())
+
+"""
+Trains the robust model on all but the last 1000 recipes with raw and with canonical ingredients, and
+compares vocabulary size, how many test ingredients are unseen, the size of the probability tables,
+training and prediction time, and accuracy on the last 1000.
+"""
+def benchmark(train_file, table_file=None):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+	truth = [recipe['cuisine'] for recipe in test_data]
+	table = load_table(table_file) if table_file else {}
+
+	results = {}
+	for name in ('raw', 'canonical'):
+		start = default_timer()
+		recipes = canonicalize_recipes(train_data, table) if name == 'canonical' else train_data
+		trainer = NaiveBayesTrainer().fit(recipes)
+		cuisine_probs = trainer.get_cuisine_probs()
+		ingredient_prob_given_cuisine = trainer.get_smoothed_ingredient_prob_given_cuisine()
+		train_time = default_timer() - start
+
+		start = default_timer()
+		if name == 'canonical':
+			guesses = [get_max_cuisine(recipe['ingredients'], cuisine_probs, ingredient_prob_given_cuisine, table) for recipe in test_data]
+		else:
+			guesses = [robust_naive_bayes_example.get_max_cuisine(recipe['ingredients'], cuisine_probs, ingredient_prob_given_cuisine)
+				for recipe in test_data]
+		predict_time = default_timer() - start
+
+		# What the model saw, for counting unseen ingredients (outside the timing)
+		if name == 'canonical':
+			queries = [canonicalize_ingredients(recipe['ingredients'], table, grow=False) for recipe in test_data]
+		else:
+			queries = [recipe['ingredients'] for recipe in test_data]
+
+		lookups = sum(len(ingredients) for ingredients in queries)
+		unseen = sum(ingredient not in trainer.vocabulary for ingredients in queries for ingredient in ingredients)
+		results[name] = {'vocabulary': len(trainer.vocabulary), 'unseen_fraction': unseen/float(lookups or 1),
+			'table_bytes': _dense_size(ingredient_prob_given_cuisine), 'train_time': train_time, 'predict_time': predict_time,
+			'accuracy': eval_classifier(list(zip(guesses, truth)))}
+		print('%-9s vocabulary %6d, unseen test ingredients %5.1f%%, tables %7.1f MB, train %.2fs, predict %.2fs, accuracy %.3f' % (name,
+			len(trainer.vocabulary), 100*results[name]['unseen_fraction'], results[name]['table_bytes']/1e6, train_time, predict_time,
+			results[name]['accuracy']))
+
+	if table_file:
+		save_table(table, table_file)
+	return results
+
+if __name__ == '__main__':
+	# python canonicalize.py ../data/test.json
+	vocabulary_report(sys.argv[1])
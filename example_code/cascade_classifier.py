@@ -0,0 +1,109 @@
+from timeit import default_timer
+
+import numpy as np
+
+import compiled_naive_bayes
+import indexed_knn_example
+import instrumentation
+from fused_trainer import NaiveBayesTrainer
+from naive_bayes_example import load_data, eval_classifier
+from sparse_robust_naive_bayes import compile_smoothed_model
+"""
+Naive bayes is cheap but gets the ambiguous recipes wrong more often; kNN does better on those but costs
+far more per recipe. The cascade runs the robust naive bayes model on every recipe and only asks kNN
+when naive bayes isn't sure.
+
+How sure naive bayes is comes from the margin: the log score of the best cuisine minus the log score of
+the second best,
+
+	margin = log(p(ingredients | best)p(best)) - log(p(ingredients | second)p(second))
+
+so a margin of 2 means naive bayes thinks the best cuisine is e^2 (about 7) times as likely as the next
+one. Recipes with a margin below threshold are escalated to kNN (indexed_knn_example, which gives the
+same answers as knn_example.get_max_cuisine); the rest keep the naive bayes answer. threshold=0 is plain
+naive bayes and threshold=inf is plain kNN; sweep shows what happens in between.
+"""
+
+"""
+Input:
+	data -> List of recipes
+	k -> number of neighbors for the kNN stage
+Output:
+	The cascade model: {'nb': compiled robust naive bayes model, 'index': kNN index, 'k': k}
+"""
+def train(data, k=6):
+	trainer = NaiveBayesTrainer().fit(data)
+	nb = compile_smoothed_model(trainer.get_cuisine_probs(), trainer.get_smoothed_counts())
+	return {'nb': nb, 'index': indexed_knn_example.build_index(data), 'k': k}
+
+"""
+Returns (best, margins) for a list of ingredient lists: the position in model['nb']['cuisines'] of the
+best naive bayes cuisine for each recipe, and its margin over the second best.
+"""
+def get_margins(ingredient_lists, model):
+	scores = compiled_naive_bayes.get_batch_log_scores(ingredient_lists, model['nb'])
+	best = np.argmax(scores, axis=1)
+	if scores.shape[1] < 2:
+		return best, np.full(len(ingredient_lists), np.inf)
+	top_two = np.partition(scores, -2, axis=1)[:, -2:]
+	return best, top_two[:, 1] - top_two[:, 0]
+
+"""
+Classifies a list of recipes: naive bayes for all of them, kNN for the ones whose margin is below
+threshold. Returns (cuisines, escalated), where escalated[i] says whether recipe i went to kNN.
+"""
+def predict_batch(ingredient_lists, model, threshold=2.0):
+	with instrumentation.stage('cascade_nb', len(ingredient_lists)):
+		best, margins = get_margins(ingredient_lists, model)
+		cuisines = [model['nb']['cuisines'][j] for j in best]
+	escalated = margins < threshold
+	with instrumentation.stage('cascade_knn') as timer:
+		for i in np.flatnonzero(escalated):
+			cuisines[i] = indexed_knn_example.get_max_cuisine(ingredient_lists[i], model['index'], model['k'])
+		timer.add(int(escalated.sum()))
+	return cuisines, escalated
+
+def get_max_cuisine(ingredient_list, model, threshold=2.0):
+	return predict_batch([ingredient_list], model, threshold)[0][0]
+
+def test_classifier(train_file, threshold=2.0, k=6):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+
+	model = train(train_data, k)
+	cuisines, escalated = predict_batch([recipe['ingredients'] for recipe in test_data], model, threshold)
+	return [(cuisine, recipe['cuisine']) for (cuisine, recipe) in zip(cuisines, test_data)]
+
+"""
+Runs the cascade on the last 1000 recipes for each threshold and prints the escalation rate, accuracy and
+throughput, plus the latency of each stage: naive bayes per recipe, and kNN per escalated recipe.
+"""
+def sweep(train_file, thresholds=(0, 0.5, 1, 2, 3, 5, 8, float('inf')), k=6):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+	ingredient_lists = [recipe['ingredients'] for recipe in test_data]
+	truth = [recipe['cuisine'] for recipe in test_data]
+	model = train(train_data, k)
+
+	start = default_timer()
+	get_margins(ingredient_lists, model)
+	nb_latency = (default_timer() - start)/len(ingredient_lists)
+	start = default_timer()
+	for ingredients in ingredient_lists:
+		indexed_knn_example.get_max_cuisine(ingredients, model['index'], k)
+	knn_latency = (default_timer() - start)/len(ingredient_lists)
+	print('naive bayes %.3fms/recipe, kNN %.3fms/recipe' % (nb_latency*1000, knn_latency*1000))
+
+	results = []
+	for threshold in thresholds:
+		start = default_timer()
+		cuisines, escalated = predict_batch(ingredient_lists, model, threshold)
+		elapsed = default_timer() - start
+		result = {'threshold': threshold, 'escalation_rate': escalated.mean(), 'accuracy': eval_classifier(list(zip(cuisines, truth))),
+			'throughput': len(ingredient_lists)/elapsed}
+		results.append(result)
+		print('threshold %5s: escalated %5.1f%%, accuracy %.3f, %8.0f recipes/s' % (threshold, 100*result['escalation_rate'],
+			result['accuracy'], result['throughput']))
+	return {'nb_latency': nb_latency, 'knn_latency': knn_latency, 'thresholds': results}
@@ -0,0 +1,208 @@
+import numpy as np
+from timeit import default_timer
+
+import naive_bayes_example
+import robust_naive_bayes_example
+from naive_bayes_example import load_data, eval_classifier
+"""
+This file takes the dictionaries that naive_bayes_example and robust_naive_bayes_example train
+(cuisine_probs and ingredient_prob_given_cuisine) and compiles them into NumPy arrays, so that
+classifying a recipe doesn't need a Python loop over every cuisine.
+
+Every ingredient and every cuisine gets an integer id, and we store log(p(ingredient | cuisine)) in a
+matrix with one row per ingredient and one column per cuisine. Multiplying probabilities turns into
+adding logs, so scoring a recipe is just picking out the rows for its ingredients and summing them,
+then adding log(p(cuisine)) and taking the biggest column. Adding logs also means long ingredient
+lists no longer multiply down to 0 (underflow), which used to make get_max_cuisine return None.
+"""
+
+"""
+Input:
+	cuisine_probs -> result of get_cuisine_probs(data)
+	ingredient_prob_given_cuisine -> result of get_ingredient_prob_given_cuisine(data)
+	default_prob -> the probability used when an ingredient isn't in a cuisine's dictionary. This
+		should be what the matching get_max_cuisine passes to .get(ingredient, ...): 0 for
+		naive_bayes_example and 1 for robust_naive_bayes_example (which ignores unseen ingredients).
+Output: The compiled model
+
+Form of Output:
+	model = {
+	'cuisines': [u'greek', u'southern_us', ...],
+	'ingredient_ids': {u'soy sauce': 0, u'feta cheese': 1, ...},
+	'log_prior': array of log(p(cuisine)), one entry per cuisine,
+	'log_probs': array of log(p(ingredient | cuisine)) with shape (ingredients + 1, cuisines)
+	}
+
+	The last row of log_probs is log(default_prob), which is what ingredients we've never seen
+	get mapped to.
+"""
+def compile_model(cuisine_probs, ingredient_prob_given_cuisine, default_prob=0):
+	# Keep the cuisines in the same order get_max_cuisine looks at them so ties go the same way
+	cuisines = list(cuisine_probs)
+	ingredient_ids = {}
+	for cuisine in cuisines:
+		for ingredient in ingredient_prob_given_cuisine.get(cuisine, {}):
+			if ingredient not in ingredient_ids:
+				ingredient_ids[ingredient] = len(ingredient_ids)
+
+	probs = np.full((len(ingredient_ids) + 1, len(cuisines)), default_prob, dtype=np.float64)
+	for j, cuisine in enumerate(cuisines):
+		for ingredient, prob in ingredient_prob_given_cuisine.get(cuisine, {}).items():
+			probs[ingredient_ids[ingredient], j] = prob
+
+	# log(0) is -inf, which is exactly what a probability of 0 should become
+	with np.errstate(divide='ignore'):
+		log_probs = np.log(probs)
+		log_prior = np.log(np.array([cuisine_probs[cuisine] for cuisine in cuisines], dtype=np.float64))
+
+	return {'cuisines': cuisines, 'ingredient_ids': ingredient_ids, 'log_prior': log_prior, 'log_probs': log_probs}
+
+"""
+Turns a list of ingredients into the row numbers of log_probs. Ingredients we've never seen map to the
+last row.
+"""
+def encode_ingredients(ingredient_list, model):
+	ingredient_ids = model['ingredient_ids']
+	unseen = len(ingredient_ids)
+	return np.array([ingredient_ids.get(ingredient, unseen) for ingredient in ingredient_list], dtype=np.intp)
+
+"""
+Turns a list of recipes' ingredient lists into one long array of row numbers plus an array of offsets
+(compressed sparse row form): the rows for recipe i are ids[offsets[i]:offsets[i + 1]].
+"""
+def encode_batch(ingredient_lists, model):
+	ingredient_ids = model['ingredient_ids']
+	unseen = len(ingredient_ids)
+	offsets = np.zeros(len(ingredient_lists) + 1, dtype=np.intp)
+	ids = []
+	for i, ingredient_list in enumerate(ingredient_lists):
+		ids.extend(ingredient_ids.get(ingredient, unseen) for ingredient in ingredient_list)
+		offsets[i + 1] = len(ids)
+	return np.array(ids, dtype=np.intp), offsets
+
+"""
+Input:
+	ingredient_list -> the list of ingredients from a new recipe we want to classify
+	model -> result of compile_model
+Output:
+	An array with log(p(ingredients | cuisine)p(cuisine)) for every cuisine, in the order of model['cuisines']
+"""
+def get_log_scores(ingredient_list, model):
+	rows = encode_ingredients(ingredient_list, model)
+	return model['log_prior'] + model['log_probs'][rows].sum(axis=0)
+
+"""
+Same as get_max_cuisine in naive_bayes_example, but works on a compiled model. Returns None if every
+cuisine has probability 0, just like the original.
+"""
+def get_max_cuisine(ingredient_list, model):
+	scores = get_log_scores(ingredient_list, model)
+	best = int(np.argmax(scores))
+	if scores[best] == -np.inf:
+		return None
+	return model['cuisines'][best]
+
+"""
+Input:
+	ingredient_lists -> a list of ingredient lists
+	model -> result of compile_model
+Output:
+	An array of shape (recipes, cuisines) with the log score of every recipe for every cuisine
+
+This is the batch version of get_log_scores. If you think of the recipes as a sparse recipe x ingredient
+count matrix, this is that matrix times log_probs: we pick out the rows for every ingredient of every
+recipe at once and add them up per recipe with np.add.reduceat.
+"""
+def get_batch_log_scores(ingredient_lists, model):
+	ids, offsets = encode_batch(ingredient_lists, model)
+	log_probs = model['log_probs']
+	scores = np.zeros((len(ingredient_lists), log_probs.shape[1]), dtype=np.float64)
+
+	# reduceat doesn't handle empty segments, so only sum recipes that have ingredients
+	starts = offsets[:-1]
+	nonempty = offsets[1:] > starts
+	if nonempty.any():
+		scores[nonempty] = np.add.reduceat(log_probs[ids], starts[nonempty], axis=0)
+	return scores + model['log_prior']
+
+"""
+Classifies a whole list of recipes in one call. Returns a list of cuisines (or None, see get_max_cuisine).
+"""
+def predict_batch(ingredient_lists, model):
+	scores = get_batch_log_scores(ingredient_lists, model)
+	best = np.argmax(scores, axis=1)
+	cuisines = model['cuisines']
+	return [None if scores[i, j] == -np.inf else cuisines[j] for (i, j) in enumerate(best)]
+
+"""
+Trains the example classifiers and compiles them.
+
+Input:
+	data -> List of recipes
+	robust -> use robust_naive_bayes_example (with the prior) instead of naive_bayes_example
+"""
+def train_model(data, robust=True):
+	if not robust:
+		cuisine_probs = naive_bayes_example.get_cuisine_probs(data)
+		ingredient_prob_given_cuisine = naive_bayes_example.get_ingredient_prob_given_cuisine(data)
+		return compile_model(cuisine_probs, ingredient_prob_given_cuisine, default_prob=0)
+
+	cuisine_probs = robust_naive_bayes_example.get_cuisine_probs(data)
+	all_cuisines = [cuisine for cuisine in cuisine_probs]
+	all_ingredients = set()
+	for recipe in data:
+		for ingredient in recipe['ingredients']:
+			all_ingredients.add(ingredient)
+	ingredient_prob_given_cuisine = robust_naive_bayes_example.get_ingredient_prob_given_cuisine(data, all_cuisines, all_ingredients)
+	return compile_model(cuisine_probs, ingredient_prob_given_cuisine, default_prob=1)
+
+"""
+Same as test_classifier in the naive bayes examples, but scores the whole test set in one call.
+"""
+def test_classifier(train_file, robust=True):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+
+	model = train_model(train_data, robust)
+	guesses = predict_batch([recipe['ingredients'] for recipe in test_data], model)
+	return [(cuisine, recipe['cuisine']) for (cuisine, recipe) in zip(guesses, test_data)]
+
+"""
+Times the dictionary get_max_cuisine against the compiled model (one recipe at a time and as a batch)
+on the held out recipes.
+"""
+def benchmark(train_file, robust=True):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+	ingredient_lists = [recipe['ingredients'] for recipe in test_data]
+	module = robust_naive_bayes_example if robust else naive_bayes_example
+
+	cuisine_probs = module.get_cuisine_probs(train_data)
+	if robust:
+		all_ingredients = set(ingredient for recipe in train_data for ingredient in recipe['ingredients'])
+		ingredient_prob_given_cuisine = module.get_ingredient_prob_given_cuisine(train_data, list(cuisine_probs), all_ingredients)
+	else:
+		ingredient_prob_given_cuisine = module.get_ingredient_prob_given_cuisine(train_data)
+	model = compile_model(cuisine_probs, ingredient_prob_given_cuisine, default_prob=1 if robust else 0)
+
+	start = default_timer()
+	original = [module.get_max_cuisine(ingredients, cuisine_probs, ingredient_prob_given_cuisine) for ingredients in ingredient_lists]
+	dict_time = default_timer() - start
+
+	start = default_timer()
+	single = [get_max_cuisine(ingredients, model) for ingredients in ingredient_lists]
+	single_time = default_timer() - start
+
+	start = default_timer()
+	batch = predict_batch(ingredient_lists, model)
+	batch_time = default_timer() - start
+
+	truth = [recipe['cuisine'] for recipe in test_data]
+	print('dicts:   %.3fs, accuracy %.3f' % (dict_time, eval_classifier(list(zip(original, truth)))))
+	print('single:  %.3fs, accuracy %.3f' % (single_time, eval_classifier(list(zip(single, truth)))))
+	print('batch:   %.3fs, accuracy %.3f' % (batch_time, eval_classifier(list(zip(batch, truth)))))
+	print('None answers: dicts %d, compiled %d' % (original.count(None), batch.count(None)))
+	print('disagreements with dicts: %d' % sum(a != b for (a, b) in zip(original, batch) if a is not None))
+	return {'dict_time': dict_time, 'single_time': single_time, 'batch_time': batch_time}
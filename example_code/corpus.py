@@ -0,0 +1,163 @@
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from timeit import default_timer
+
+import numpy as np
+
+import indexed_knn_example
+from fused_trainer import NaiveBayesTrainer
+from knn_example import load_data, make_ingredient_list_into_set
+from streaming_loader import iter_recipes
+"""
+load_data gives back a list of dictionaries, each holding the cuisine and a list of ingredient
+strings, and knn_example.make_ingredient_list_into_set adds a set per recipe on top of that. Every one
+of those is a separate Python object, and the same ingredient name is stored again in every recipe
+that uses it, so the data takes up far more memory than the file it came from.
+
+Corpus stores the same recipes much more compactly. Every cuisine and every ingredient name is stored
+once and given an integer id, and the recipes are stored as flat arrays of ids (compressed sparse row
+form, like compiled_naive_bayes.encode_batch):
+
+	labels[i]                             the cuisine id of recipe i
+	tokens[offsets[i]:offsets[i + 1]]     the ingredient ids of recipe i, in increasing order
+
+The arrays are Python array.array objects (as_numpy gives NumPy views of them without copying).
+NaiveBayesTrainer.fit_corpus and indexed_knn_example.build_index_from_corpus train straight from a
+Corpus.
+"""
+
+class Corpus(object):
+	def __init__(self):
+		self.cuisines = []
+		self.cuisine_ids = {}
+		self.ingredients = []
+		self.ingredient_ids = {}
+		self.labels = array('i')
+		self.offsets = array('q', [0])
+		self.tokens = array('i')
+		self.recipe_ids = array('q')
+
+	"""
+	Builds a Corpus from a list (or iterator, like streaming_loader.iter_recipes) of recipes. Recipes
+	without a cuisine (like the ones in test.json) get label -1, and recipes without an id get id -1.
+	"""
+	@classmethod
+	def from_recipes(cls, recipes):
+		corpus = cls()
+		corpus.extend(recipes)
+		return corpus
+
+	"""
+	Adds more recipes to the end of the corpus.
+	"""
+	def extend(self, recipes):
+		cuisine_ids = self.cuisine_ids
+		ingredient_ids = self.ingredient_ids
+		labels = self.labels
+		offsets = self.offsets
+		tokens = self.tokens
+		recipe_ids = self.recipe_ids
+		for recipe in recipes:
+			cuisine = recipe.get('cuisine')
+			if cuisine is None:
+				labels.append(-1)
+			else:
+				label = cuisine_ids.get(cuisine)
+				if label is None:
+					label = cuisine_ids[cuisine] = len(self.cuisines)
+					self.cuisines.append(cuisine)
+				labels.append(label)
+
+			ids = []
+			for ingredient in recipe['ingredients']:
+				ingredient_id = ingredient_ids.get(ingredient)
+				if ingredient_id is None:
+					ingredient_id = ingredient_ids[ingredient] = len(self.ingredients)
+					self.ingredients.append(ingredient)
+				ids.append(ingredient_id)
+			ids.sort()
+			tokens.extend(ids)
+			offsets.append(len(tokens))
+			recipe_ids.append(recipe.get('id', -1))
+
+	def __len__(self):
+		return len(self.labels)
+
+	"""
+	Returns the ingredient ids of recipe i (sorted, repeats kept) as an array.
+	"""
+	def recipe_ingredient_ids(self, i):
+		return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+	"""
+	Returns recipe i as a dictionary, in the same form load_data gives.
+	"""
+	def recipe(self, i):
+		ingredients = self.ingredients
+		recipe = {'id': self.recipe_ids[i], 'ingredients': [ingredients[j] for j in self.recipe_ingredient_ids(i)]}
+		if self.labels[i] >= 0:
+			recipe['cuisine'] = self.cuisines[self.labels[i]]
+		return recipe
+
+	"""
+	Returns True if recipe i contains the ingredient (a name or an id). This is a binary search over
+	the recipe's sorted ids, so it doesn't need a set per recipe.
+	"""
+	def contains(self, i, ingredient):
+		if not isinstance(ingredient, int):
+			ingredient = self.ingredient_ids.get(ingredient)
+			if ingredient is None:
+				return False
+		start, end = self.offsets[i], self.offsets[i + 1]
+		position = bisect_left(self.tokens, ingredient, start, end)
+		return position < end and self.tokens[position] == ingredient
+
+	"""
+	Yields (label, ingredient ids) for every recipe.
+	"""
+	def __iter__(self):
+		tokens = self.tokens
+		offsets = self.offsets
+		for i, label in enumerate(self.labels):
+			yield label, tokens[offsets[i]:offsets[i + 1]]
+
+	"""
+	Returns (labels, offsets, tokens) as NumPy arrays that share memory with the corpus.
+	"""
+	def as_numpy(self):
+		return (np.frombuffer(self.labels, dtype=np.intc), np.frombuffer(self.offsets, dtype=np.int64),
+			np.frombuffer(self.tokens, dtype=np.intc))
+
+def _measure(build):
+	tracemalloc.start()
+	result = build()
+	retained, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return result, retained, peak
+
+"""
+Compares keeping train_file as load_data's list of dictionaries (with make_ingredient_list_into_set, as
+knn_example does) against a Corpus: the memory each holds on to, and how long it takes to build the kNN
+index and train NaiveBayesTrainer from each.
+"""
+def benchmark(train_file):
+	data, dict_bytes, dict_peak = _measure(lambda: make_ingredient_list_into_set(load_data(train_file)))
+	corpus, corpus_bytes, corpus_peak = _measure(lambda: Corpus.from_recipes(iter_recipes(train_file)))
+
+	results = {'dict_bytes': dict_bytes, 'dict_peak_bytes': dict_peak, 'corpus_bytes': corpus_bytes, 'corpus_peak_bytes': corpus_peak}
+	print('list of dicts: %.1f MB (peak %.1f MB), corpus: %.1f MB (peak %.1f MB), %.1fx smaller' % (dict_bytes/1e6, dict_peak/1e6,
+		corpus_bytes/1e6, corpus_peak/1e6, dict_bytes/float(corpus_bytes)))
+
+	for name, from_dicts, from_corpus in (
+			('knn index', lambda: indexed_knn_example.build_index(data), lambda: indexed_knn_example.build_index_from_corpus(corpus)),
+			('nb training', lambda: NaiveBayesTrainer().fit(data), lambda: NaiveBayesTrainer().fit_corpus(corpus))):
+		start = default_timer()
+		from_dicts()
+		dict_time = default_timer() - start
+		start = default_timer()
+		from_corpus()
+		corpus_time = default_timer() - start
+		results[name] = {'dict_time': dict_time, 'corpus_time': corpus_time}
+		print('%-11s from dicts %.3fs, from corpus %.3fs' % (name, dict_time, corpus_time))
+	return results
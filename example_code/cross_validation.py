@@ -0,0 +1,198 @@
+import math
+import multiprocessing
+import random
+from collections import Counter
+from timeit import default_timer
+
+import numpy as np
+
+import indexed_knn_example
+from naive_bayes_example import load_data
+"""
+test_classifier always tests on the last 1000 recipes, loads the file again every time it's called,
+and gives back a single accuracy. To pick the prior for robust naive bayes (0.15) or K for kNN you'd
+have to call it over and over, retraining from scratch each time.
+
+cross_validate loads the data once and splits it into n_folds folds. Each fold takes a turn as the test
+set while the model is trained on the others, and we report the average accuracy (and how much it
+varies) over all the folds. It tries a whole list of priors and a whole list of K values in one go:
+
+	- Naive bayes: the recipes are turned into integer ids once, and the (ingredient, cuisine) counts are
+	  computed once for the whole dataset. The counts for "everything but fold f" are then just the total
+	  counts minus fold f's counts, so nothing is retrained. Each prior is a few NumPy operations on top.
+	- kNN: the K nearest neighbors only need to be found once for the biggest K. The answer for any
+	  smaller K is a vote among the closest K of those.
+
+The folds can be evaluated in parallel with workers > 1.
+"""
+
+"""
+Turns a list of recipes into integer arrays.
+
+Form of Output:
+	encoded = {
+	'cuisines': [u'greek', ...],            cuisine names by id
+	'ingredients': [u'feta cheese', ...],   ingredient names by id
+	'labels': array with the cuisine id of every recipe,
+	'ids': array with the ingredient ids of every recipe, one recipe after another,
+	'offsets': array where recipe i's ingredient ids are ids[offsets[i]:offsets[i + 1]],
+	'token_recipe': array with, for every entry of ids, the recipe it belongs to
+	}
+"""
+def encode(data):
+	cuisine_ids = {}
+	ingredient_ids = {}
+	labels = []
+	ids = []
+	offsets = [0]
+	for recipe in data:
+		labels.append(cuisine_ids.setdefault(recipe['cuisine'], len(cuisine_ids)))
+		for ingredient in recipe['ingredients']:
+			ids.append(ingredient_ids.setdefault(ingredient, len(ingredient_ids)))
+		offsets.append(len(ids))
+
+	offsets = np.array(offsets, dtype=np.intp)
+	return {'cuisines': list(cuisine_ids), 'ingredients': list(ingredient_ids), 'labels': np.array(labels, dtype=np.intp),
+		'ids': np.array(ids, dtype=np.intp), 'offsets': offsets,
+		'token_recipe': np.repeat(np.arange(len(labels)), np.diff(offsets))}
+
+"""
+Returns the (ingredients x cuisines) count matrix for the ingredient entries picked out by token_mask.
+"""
+def count_ingredients(encoded, token_mask=None):
+	ids = encoded['ids']
+	labels = encoded['labels'][encoded['token_recipe']]
+	if token_mask is not None:
+		ids = ids[token_mask]
+		labels = labels[token_mask]
+	num_cuisines = len(encoded['cuisines'])
+	num_ingredients = len(encoded['ingredients'])
+	counts = np.bincount(ids*num_cuisines + labels, minlength=num_ingredients*num_cuisines)
+	return counts.reshape(num_ingredients, num_cuisines).astype(np.float64)
+
+"""
+Returns the fold number of every recipe: the recipes are shuffled with seed and dealt out round robin.
+"""
+def assign_folds(num_recipes, n_folds, seed=0):
+	order = list(range(num_recipes))
+	random.Random(seed).shuffle(order)
+	folds = np.empty(num_recipes, dtype=np.intp)
+	folds[order] = np.arange(num_recipes) % n_folds
+	return folds
+
+# Set in each worker process by _init_worker
+_state = None
+
+def _init_worker(data, encoded, folds, total_counts):
+	global _state
+	_state = {'data': data, 'encoded': encoded, 'folds': folds, 'total_counts': total_counts}
+
+"""
+Evaluates every prior and every K on one fold. Returns {config: (correct, tested, seconds)}.
+"""
+def _evaluate_fold(args):
+	fold, priors, ks = args
+	encoded = _state['encoded']
+	folds = _state['folds']
+	labels = encoded['labels']
+	num_cuisines = len(encoded['cuisines'])
+	test = np.flatnonzero(folds == fold)
+	results = {}
+
+	if priors:
+		start = default_timer()
+		token_mask = folds[encoded['token_recipe']] == fold
+		train_counts = _state['total_counts'] - count_ingredients(encoded, token_mask)
+		train_cuisines = np.bincount(labels[folds != fold], minlength=num_cuisines).astype(np.float64)
+		# Ingredients that only appear in the test fold weren't seen in training
+		seen = train_counts.sum(axis=1) > 0
+		num_seen = seen.sum()
+		totals = train_counts.sum(axis=0)
+		with np.errstate(divide='ignore'):
+			log_prior = np.log(train_cuisines/train_cuisines.sum())
+
+		# Sum the ingredient rows per test recipe (see compiled_naive_bayes.get_batch_log_scores)
+		test_ids = encoded['ids'][token_mask]
+		lengths = np.diff(encoded['offsets'])[test]
+		starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+		nonempty = lengths > 0
+		setup_time = default_timer() - start
+
+		for prior in priors:
+			start = default_timer()
+			with np.errstate(divide='ignore', invalid='ignore'):
+				log_probs = np.log(train_counts + prior) - np.log(totals + prior*num_seen)
+			# Unseen ingredients are ignored with a prior, and have probability 0 without one
+			log_probs[~seen] = 0 if prior > 0 else -np.inf
+			# A cuisine with no training ingredients (say, one that's only in the test fold) gives 0/0 without
+			# a prior; any ingredient it's asked about has probability 0, not NaN, which argmax would pick
+			log_probs[np.ix_(seen, totals + prior*num_seen == 0)] = -np.inf
+			scores = np.zeros((len(test), num_cuisines))
+			if nonempty.any():
+				scores[nonempty] = np.add.reduceat(log_probs[test_ids], starts[nonempty], axis=0)
+			scores += log_prior
+			guesses = np.argmax(scores, axis=1)
+			correct = (guesses == labels[test]) & (scores.max(axis=1) > -np.inf)
+			results[('naive_bayes', prior)] = (int(correct.sum()), len(test), setup_time + default_timer() - start)
+
+	if ks:
+		data = _state['data']
+		start = default_timer()
+		index = indexed_knn_example.build_index([data[i] for i in np.flatnonzero(folds != fold)])
+		neighbors = [indexed_knn_example.get_nearest_neighbors(data[i]['ingredients'], index, max(ks)) for i in test]
+		search_time = default_timer() - start
+
+		cuisines = index['cuisines']
+		for k in ks:
+			start = default_timer()
+			correct = 0
+			for i, nearest in zip(test, neighbors):
+				counter = Counter([cuisines[j] for (score, j) in nearest[-k:]])
+				correct += counter.most_common(1)[0][0] == data[i]['cuisine']
+			results[('knn', k)] = (correct, len(test), search_time + default_timer() - start)
+
+	return results
+
+"""
+Input:
+	train_file -> the training data
+	priors -> robust naive bayes priors to try (0 is plain naive bayes)
+	ks -> kNN K values to try
+	n_folds -> number of folds
+	workers -> number of processes to evaluate folds in
+	seed -> seed for shuffling recipes into folds
+Output:
+	A list with one dictionary per configuration:
+	{'model': 'naive_bayes' or 'knn', 'param': the prior or K, 'mean_accuracy', 'std_accuracy', 'time'}
+
+	time is the total time spent on that configuration over all folds. For kNN the neighbor search is
+	shared by every K, so it's included in each K's time.
+"""
+def cross_validate(train_file, priors=(0.01, 0.05, 0.15, 0.5, 1.0), ks=(1, 3, 6, 10, 20), n_folds=5, workers=1, seed=0):
+	data = load_data(train_file)
+	encoded = encode(data)
+	folds = assign_folds(len(data), n_folds, seed)
+	total_counts = count_ingredients(encoded)
+
+	jobs = [(fold, list(priors), list(ks)) for fold in range(n_folds)]
+	if workers <= 1:
+		_init_worker(data, encoded, folds, total_counts)
+		fold_results = [_evaluate_fold(job) for job in jobs]
+	else:
+		pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(data, encoded, folds, total_counts))
+		try:
+			fold_results = pool.map(_evaluate_fold, jobs)
+		finally:
+			pool.close()
+			pool.join()
+
+	report = []
+	configs = [('naive_bayes', prior) for prior in priors] + [('knn', k) for k in ks]
+	for config in configs:
+		accuracies = [results[config][0]/float(results[config][1]) for results in fold_results]
+		mean = sum(accuracies)/len(accuracies)
+		std = math.sqrt(sum((accuracy - mean)**2 for accuracy in accuracies)/len(accuracies))
+		elapsed = sum(results[config][2] for results in fold_results)
+		report.append({'model': config[0], 'param': config[1], 'mean_accuracy': mean, 'std_accuracy': std, 'time': elapsed})
+		print('%-11s %-5s accuracy %.4f +/- %.4f  (%.3fs)' % (config[0], config[1], mean, std, elapsed))
+	return report
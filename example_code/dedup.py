@@ -0,0 +1,179 @@
+import heapq
+import random
+from collections import Counter
+from timeit import default_timer
+
+import indexed_knn_example
+from fused_trainer import NaiveBayesTrainer
+from naive_bayes_example import load_data
+"""
+Lots of recipes have exactly the same ingredients as another one, sometimes just listed in a different
+order. Training and kNN still treat each of them as a separate recipe, so every repeat costs another
+pass through its ingredients when counting and another score in every kNN query.
+
+deduplicate collapses recipes with the same ingredients (compared as a sorted list, so order doesn't
+matter but how many times an ingredient is listed does) into one record that remembers how many recipes
+of each cuisine it stands for and where those recipes were in the data. NaiveBayesTrainer.fit_weighted
+and the kNN functions here use the records directly, and give exactly the same answers as working on
+the original recipes, including how ties are broken.
+
+Spellings that differ ("eggs" and "Eggs") are different ingredients here; run the recipes through
+canonicalize.canonicalize_recipes first to merge those too.
+"""
+
+"""
+Input: List of recipes
+Output: The deduplicated corpus
+
+Form of Output:
+	deduplicated = {
+	'records': [{'ingredients': [u'soy sauce', u'rice', ...],
+				 'weights': {u'chinese': 3, u'japanese': 1},
+				 'members': [17, 402, 3310, 9021]},
+				...],
+	'cuisines': cuisines in the order they first appear in the data,
+	'labels': the cuisine of every original recipe, by position
+	}
+
+	records are in the order their first recipe appears in the data, and members holds the positions of
+	the recipes a record stands for, in increasing order.
+"""
+def deduplicate(data):
+	records = []
+	by_key = {}
+	cuisines = {}
+	labels = []
+	for i, recipe in enumerate(data):
+		cuisine = recipe['cuisine']
+		cuisines.setdefault(cuisine, None)
+		labels.append(cuisine)
+		key = tuple(sorted(recipe['ingredients']))
+		record = by_key.get(key)
+		if record is None:
+			record = by_key[key] = {'ingredients': list(recipe['ingredients']), 'weights': {}, 'members': []}
+			records.append(record)
+		record['weights'][cuisine] = record['weights'].get(cuisine, 0) + 1
+		record['members'].append(i)
+	return {'records': records, 'cuisines': list(cuisines), 'labels': labels}
+
+"""
+Trains NaiveBayesTrainer on a deduplicated corpus. Gives the same counts as NaiveBayesTrainer().fit(data).
+"""
+def train(deduplicated):
+	return NaiveBayesTrainer().fit_weighted(deduplicated['records'], deduplicated['cuisines'])
+
+"""
+Same as indexed_knn_example.build_index, but the postings hold record numbers, so a repeated recipe is
+only in each list once. The records are numbered in order of the position of their last recipe.
+"""
+def build_index(deduplicated):
+	# Numbered this way, a higher record number means a later last recipe (see get_nearest_neighbors)
+	records = sorted(deduplicated['records'], key=lambda record: record['members'][-1])
+	postings = {}
+	record_of = [0]*len(deduplicated['labels'])
+	for r, record in enumerate(records):
+		for ingredient in set(record['ingredients']):
+			found = postings.get(ingredient)
+			if found is None:
+				found = postings[ingredient] = []
+			found.append(r)
+		for i in record['members']:
+			record_of[i] = r
+	return {'postings': postings, 'members': [record['members'] for record in records], 'cuisines': deduplicated['labels'],
+		'record_of': record_of}
+
+"""
+Same output as indexed_knn_example.get_nearest_neighbors: the k nearest original recipes as
+(score, position) tuples from the furthest to the closest, with ties going to the later recipe.
+
+Scores are worked out once per record. Ranking records by (score, record number) ranks them by score and
+then by their last recipe, and the records of the k best recipes are always among the k best records
+(every record ranked above another has a recipe that beats all of that one's recipes), so only those k
+records are expanded into recipes.
+"""
+def get_nearest_neighbors(ingredients_list, index, k):
+	postings = index['postings']
+	members = index['members']
+	scores = Counter()
+	for ingredient in ingredients_list:
+		found = postings.get(ingredient)
+		if found:
+			scores.update(found)
+
+	best_records = heapq.nlargest(k, ((score, r) for (r, score) in scores.items()))
+	neighbors = heapq.nlargest(k, ((score, i) for (score, r) in best_records for i in members[r]))
+	i = len(index['cuisines']) - 1
+	record_of = index['record_of']
+	while len(neighbors) < k and i >= 0:
+		if record_of[i] not in scores:
+			neighbors.append((0, i))
+		i -= 1
+	neighbors.reverse()
+	return neighbors
+
+"""
+Same as indexed_knn_example.get_max_cuisine, but takes the index from build_index(deduplicate(data)).
+"""
+def get_max_cuisine(ingredients_list, index, k):
+	cuisines = index['cuisines']
+	counter = Counter([cuisines[i] for (score, i) in get_nearest_neighbors(ingredients_list, index, k)])
+	return counter.most_common(1)[0][0]
+
+"""
+Returns data with every recipe repeated copies times (with the ingredients shuffled in the repeats), so
+there's something to deduplicate.
+"""
+def make_duplicates(data, copies, seed=0):
+	rng = random.Random(seed)
+	repeated = []
+	for _ in range(copies):
+		for recipe in data:
+			ingredients = list(recipe['ingredients'])
+			rng.shuffle(ingredients)
+			repeated.append({'id': recipe.get('id'), 'cuisine': recipe['cuisine'], 'ingredients': ingredients})
+	rng.shuffle(repeated)
+	return repeated
+
+"""
+Deduplicates all but the last 1000 recipes of train_file (repeated copies times with make_duplicates, if
+copies > 1) and reports the compression ratio, the time for naive bayes training and kNN queries with and
+without deduplication, and checks the answers are identical.
+"""
+def benchmark(train_file, copies=1, k=6, num_queries=200):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	if copies > 1:
+		train_data = make_duplicates(train_data, copies)
+	queries = [recipe['ingredients'] for recipe in data[-1000:][:num_queries]]
+
+	start = default_timer()
+	deduplicated = deduplicate(train_data)
+	dedup_time = default_timer() - start
+	ratio = len(train_data)/float(len(deduplicated['records']))
+	print('%d recipes -> %d records (%.2fx), deduplicating took %.2fs' % (len(train_data), len(deduplicated['records']), ratio, dedup_time))
+
+	start = default_timer()
+	expected = NaiveBayesTrainer().fit(train_data)
+	fit_time = default_timer() - start
+	start = default_timer()
+	trainer = train(deduplicated)
+	weighted_time = default_timer() - start
+	if (list(trainer.cuisine_count.items()) != list(expected.cuisine_count.items()) or trainer.ingredient_count != expected.ingredient_count
+			or trainer.ingredient_total != expected.ingredient_total or trainer.vocabulary != expected.vocabulary):
+		raise AssertionError('weighted training gives different counts')
+	print('naive bayes training: %.3fs, deduplicated %.3fs (%.1fx)' % (fit_time, weighted_time, fit_time/weighted_time))
+
+	plain_index = indexed_knn_example.build_index(train_data)
+	index = build_index(deduplicated)
+	start = default_timer()
+	plain = [indexed_knn_example.get_max_cuisine(ingredients, plain_index, k) for ingredients in queries]
+	plain_time = (default_timer() - start)/len(queries)
+	start = default_timer()
+	answers = [get_max_cuisine(ingredients, index, k) for ingredients in queries]
+	dedup_query_time = (default_timer() - start)/len(queries)
+	if answers != plain:
+		raise AssertionError('deduplicated kNN disagrees on %d queries' % sum(a != b for (a, b) in zip(plain, answers)))
+	print('kNN query: %.3fms, deduplicated %.3fms (%.1fx)' % (plain_time*1000, dedup_query_time*1000, plain_time/dedup_query_time))
+
+	return {'recipes': len(train_data), 'records': len(deduplicated['records']), 'compression': ratio, 'dedup_time': dedup_time,
+		'fit_time': fit_time, 'weighted_fit_time': weighted_time, 'knn_time': plain_time, 'dedup_knn_time': dedup_query_time}
@@ -0,0 +1,163 @@
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+import indexed_knn_example
+import robust_naive_bayes_example
+from naive_bayes_example import load_data, eval_classifier
+"""
+Every ingredient seen in training, even once, gets a probability for every cuisine in the robust model
+and sits in the kNN ingredient sets. Most of those rare ingredients say almost nothing about the cuisine
+but still make the model bigger and get looked up in every get_max_cuisine call.
+
+This file picks which ingredients to keep. In one pass over the training data it counts, for every
+ingredient, how many recipes contain it (its document frequency) overall and per cuisine. From those
+counts it works out the mutual information between "the recipe contains this ingredient" and the
+cuisine: how much knowing whether the ingredient is there tells you about the cuisine, in nats. An
+ingredient that's spread evenly over the cuisines scores about 0, and so does one that hardly ever
+appears; one that shows up often and mostly in one cuisine scores high.
+
+select_ingredients keeps the ingredients seen in at least min_count recipes, with at least min_information,
+and then the top_n by mutual information. Training then only sees the kept ingredients (prune_recipes),
+so anything else is unseen at prediction time and ignored like any other unseen ingredient.
+
+	stats = get_ingredient_stats(train_data)
+	keep = select_ingredients(stats, top_n=1000)
+	train_data = list(prune_recipes(train_data, keep))
+"""
+
+"""
+Input: List of recipes (or any iterable, it's only looped over once)
+Output: The document frequency counts
+
+Form of Output:
+	stats = {
+	'cuisine_count': {u'greek': 1175, u'indian': 3003, ...},
+	'document_frequency': {u'feta cheese': {u'greek': 288, u'italian': 95, ...}, ...},
+	'num_recipes': 39774
+	}
+
+	document_frequency[ingredient][cuisine] is the number of recipes of that cuisine that contain the
+	ingredient (counted once per recipe, however many times it's listed).
+"""
+def get_ingredient_stats(data):
+	cuisine_count = {}
+	document_frequency = {}
+	num_recipes = 0
+	for recipe in data:
+		cuisine = recipe['cuisine']
+		cuisine_count[cuisine] = cuisine_count.get(cuisine, 0) + 1
+		num_recipes += 1
+		for ingredient in set(recipe['ingredients']):
+			counts = document_frequency.get(ingredient)
+			if counts is None:
+				counts = document_frequency[ingredient] = {}
+			counts[cuisine] = counts.get(cuisine, 0) + 1
+	return {'cuisine_count': cuisine_count, 'document_frequency': document_frequency, 'num_recipes': num_recipes}
+
+"""
+Returns (ingredients, frequency, information): the ingredients as a list, how many recipes contain each
+one, and the mutual information in nats between each one being in a recipe and the recipe's cuisine.
+"""
+def mutual_information(stats):
+	cuisines = list(stats['cuisine_count'])
+	cuisine_ids = {cuisine : j for (j, cuisine) in enumerate(cuisines)}
+	ingredients = list(stats['document_frequency'])
+	present = np.zeros((len(ingredients), len(cuisines)), dtype=np.float64)
+	for i, ingredient in enumerate(ingredients):
+		for cuisine, count in stats['document_frequency'][ingredient].items():
+			present[i, cuisine_ids[cuisine]] = count
+
+	num_recipes = float(stats['num_recipes'])
+	per_cuisine = np.array([stats['cuisine_count'][cuisine] for cuisine in cuisines], dtype=np.float64)
+	frequency = present.sum(axis=1)
+	absent = per_cuisine - present
+
+	information = np.zeros(len(ingredients))
+	# Sum p(x, c) log(p(x, c)/(p(x)p(c))) over x (present or absent) and c, where 0 log 0 counts as 0
+	for joint, marginal in ((present, frequency), (absent, num_recipes - frequency)):
+		with np.errstate(divide='ignore', invalid='ignore'):
+			terms = joint/num_recipes*np.log(joint*num_recipes/(marginal[:, None]*per_cuisine))
+		information += np.where(joint > 0, terms, 0).sum(axis=1)
+	return ingredients, frequency.astype(np.int64), information
+
+"""
+Input:
+	stats -> result of get_ingredient_stats
+	top_n -> keep at most this many ingredients, the ones with the most mutual information (None keeps all)
+	min_count -> drop ingredients found in fewer recipes than this
+	min_information -> drop ingredients with less mutual information than this
+Output:
+	The set of ingredients to keep
+"""
+def select_ingredients(stats, top_n=None, min_count=1, min_information=None):
+	ingredients, frequency, information = mutual_information(stats)
+	candidates = frequency >= min_count
+	if min_information is not None:
+		candidates &= information >= min_information
+	order = [i for i in np.lexsort((-frequency, -information)) if candidates[i]]
+	if top_n is not None:
+		order = order[:top_n]
+	return set(ingredients[i] for i in order)
+
+"""
+Yields a copy of each recipe with only the ingredients in keep.
+"""
+def prune_recipes(recipes, keep):
+	for recipe in recipes:
+		recipe = dict(recipe)
+		recipe['ingredients'] = [ingredient for ingredient in recipe['ingredients'] if ingredient in keep]
+		yield recipe
+
+def _train_robust(train_data):
+	cuisine_probs = robust_naive_bayes_example.get_cuisine_probs(train_data)
+	all_ingredients = set(ingredient for recipe in train_data for ingredient in recipe['ingredients'])
+	return cuisine_probs, robust_naive_bayes_example.get_ingredient_prob_given_cuisine(train_data, list(cuisine_probs), all_ingredients)
+
+"""
+For every size in top_ns (None means no pruning), selects that many ingredients from all but the last
+1000 recipes, trains robust naive bayes and a kNN index on the pruned recipes and reports the size of the
+probability tables, selection, training and prediction time, and accuracy of both on the last 1000.
+Test recipes are pruned the same way before prediction.
+"""
+def benchmark(train_file, top_ns=(100, 300, 1000, 2000, None), min_count=1, k=6, knn_queries=300):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+	truth = [recipe['cuisine'] for recipe in test_data]
+
+	start = default_timer()
+	stats = get_ingredient_stats(train_data)
+	stats_time = default_timer() - start
+	print('counting document frequencies: %.3fs, %d ingredients' % (stats_time, len(stats['document_frequency'])))
+
+	results = []
+	for top_n in top_ns:
+		start = default_timer()
+		keep = select_ingredients(stats, top_n, min_count)
+		pruned = list(prune_recipes(train_data, keep))
+		select_time = default_timer() - start
+
+		start = default_timer()
+		cuisine_probs, ingredient_prob_given_cuisine = _train_robust(pruned)
+		train_time = default_timer() - start
+		table_bytes = sum(sys.getsizeof(probs) for probs in ingredient_prob_given_cuisine.values())
+
+		queries = [recipe['ingredients'] for recipe in prune_recipes(test_data, keep)]
+		start = default_timer()
+		guesses = [robust_naive_bayes_example.get_max_cuisine(ingredients, cuisine_probs, ingredient_prob_given_cuisine) for ingredients in queries]
+		predict_time = default_timer() - start
+
+		index = indexed_knn_example.build_index(pruned)
+		start = default_timer()
+		neighbors = [indexed_knn_example.get_max_cuisine(ingredients, index, k) for ingredients in queries[:knn_queries]]
+		knn_time = (default_timer() - start)/len(neighbors)
+
+		result = {'top_n': top_n, 'ingredients': len(keep), 'table_bytes': table_bytes, 'select_time': select_time, 'train_time': train_time,
+			'predict_time': predict_time, 'accuracy': eval_classifier(list(zip(guesses, truth))), 'knn_time': knn_time,
+			'knn_accuracy': eval_classifier(list(zip(neighbors, truth)))}
+		results.append(result)
+		print('%6s ingredients: tables %6.1f MB, select %.2fs, train %.2fs, predict %.2fs, accuracy %.3f | kNN %.2fms/query, accuracy %.3f' % (
+			len(keep), table_bytes/1e6, select_time, train_time, predict_time, result['accuracy'], knn_time*1000, result['knn_accuracy']))
+	return results
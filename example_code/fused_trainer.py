@@ -0,0 +1,273 @@
+from collections import Counter
+from timeit import default_timer
+
+import numpy as np
+
+import naive_bayes_example
+import robust_naive_bayes_example
+from naive_bayes_example import load_data
+"""
+test_classifier walks through the training data once in get_cuisine_probs and again in
+get_ingredient_prob_given_cuisine (and robust_naive_bayes_example walks through it a third time to
+collect all_ingredients). NaiveBayesTrainer collects everything those passes need - how many recipes
+each cuisine has, how many times each ingredient appears with each cuisine, and the set of all
+ingredients - in one walk through the data. Both the plain and the smoothed probability tables are
+then worked out from those counts, without looking at the data again.
+
+Because it only loops over the recipes once, it also works with streaming_loader.iter_recipes.
+"""
+
+class NaiveBayesTrainer(object):
+	"""
+	Counts collected from the training data:
+		cuisine_count -> {cuisine: number of recipes}
+		ingredient_count -> {cuisine: Counter({ingredient: number of times it appears with that cuisine})}
+		ingredient_total -> {cuisine: number of ingredients counted for that cuisine}
+		vocabulary -> Counter({ingredient: number of times it appears in any recipe})
+		num_recipes -> number of recipes
+	"""
+	def __init__(self):
+		self.cuisine_count = {}
+		self.ingredient_count = {}
+		self.ingredient_total = {}
+		self.vocabulary = Counter()
+		self.num_recipes = 0
+
+	"""
+	Adds the counts for a list (or any iterable) of recipes. Calling fit again adds more recipes on top
+	of the ones already counted.
+
+	Rather than bumping a dictionary entry for every single ingredient, the ingredients are collected
+	into one list per cuisine and counted in bulk by Counter (which does the counting in C) every
+	batch_size ingredients, so memory stays bounded when recipes come from a stream.
+	"""
+	def fit(self, recipes, batch_size=1 << 16):
+		cuisine_count = self.cuisine_count
+		pending = {}
+		pending_size = 0
+		num_recipes = 0
+		for recipe in recipes:
+			cuisine = recipe['cuisine']
+			ingredients = recipe['ingredients']
+			cuisine_ingredients = pending.get(cuisine)
+			if cuisine_ingredients is None:
+				cuisine_ingredients = pending[cuisine] = []
+			cuisine_ingredients.extend(ingredients)
+			cuisine_count[cuisine] = cuisine_count.get(cuisine, 0) + 1
+			num_recipes += 1
+			pending_size += len(ingredients)
+			if pending_size >= batch_size:
+				self._add_ingredients(pending)
+				pending = {}
+				pending_size = 0
+		self._add_ingredients(pending)
+		self.num_recipes += num_recipes
+		return self
+
+	"""
+	Same as fit, but takes a corpus.Corpus instead of a list of recipes. The ingredient ids are counted
+	straight from the corpus arrays with np.bincount, one cuisine at a time, and only the ingredients a
+	cuisine actually has are turned back into names.
+	"""
+	def fit_corpus(self, corpus):
+		labels, offsets, tokens = corpus.as_numpy()
+		if len(labels) and labels.min() < 0:
+			raise ValueError('cannot train on a recipe without a cuisine')
+
+		# Cuisines in the order they first appear, like fit counts them
+		present, first = np.unique(labels, return_index=True)
+		order = present[np.argsort(first)]
+		token_labels = np.repeat(labels, np.diff(offsets))
+		ingredients = corpus.ingredients
+		for label in order:
+			cuisine = corpus.cuisines[label]
+			self.cuisine_count[cuisine] = self.cuisine_count.get(cuisine, 0) + int((labels == label).sum())
+			# Like fit, a cuisine whose recipes have no ingredients still gets an (empty) entry
+			frequency = np.bincount(tokens[token_labels == label])
+			found = np.flatnonzero(frequency)
+			self._add_counts(cuisine, Counter(dict(zip([ingredients[j] for j in found], frequency[found].tolist()))), int(frequency.sum()))
+		self.num_recipes += len(labels)
+		return self
+
+	"""
+	Same as fit, but takes the weighted records from dedup.deduplicate: each record stands for
+	record['weights'][cuisine] recipes of that cuisine with the same ingredients. cuisines is the order
+	the cuisines first appear in the original data (dedup.deduplicate gives it too), so the dictionaries
+	come out in the same order as fit would make them.
+	"""
+	def fit_weighted(self, records, cuisines=()):
+		cuisine_count = self.cuisine_count
+		for cuisine in cuisines:
+			cuisine_count.setdefault(cuisine, 0)
+		pending = {}
+		heavy = {}
+		for record in records:
+			ingredients = record['ingredients']
+			for cuisine, weight in record['weights'].items():
+				cuisine_count[cuisine] = cuisine_count.get(cuisine, 0) + weight
+				self.num_recipes += weight
+				if weight == 1:
+					cuisine_ingredients = pending.get(cuisine)
+					if cuisine_ingredients is None:
+						cuisine_ingredients = pending[cuisine] = []
+					cuisine_ingredients.extend(ingredients)
+				else:
+					# Counting a repeated record once, times its weight, is what saves the work
+					counts = heavy.get(cuisine)
+					if counts is None:
+						counts = heavy[cuisine] = Counter()
+					for ingredient in ingredients:
+						counts[ingredient] += weight
+		self._add_ingredients(pending)
+		for cuisine, counts in heavy.items():
+			if cuisine not in self.ingredient_count:
+				self.ingredient_count[cuisine] = Counter()
+				self.ingredient_total[cuisine] = 0
+			self.ingredient_count[cuisine].update(counts)
+			self.ingredient_total[cuisine] += sum(counts.values())
+			self.vocabulary.update(counts)
+		return self
+
+	"""
+	Adds the counts of another trainer (say, one that counted a different part of the data) to this one
+	and returns self. Merging is associative, and as long as the parts are merged in the order they come
+	in the data, the result is exactly what one fit over all of the data gives, down to the order of the
+	dictionaries (which decides how get_max_cuisine breaks ties).
+	"""
+	def merge(self, other):
+		for cuisine, count in other.cuisine_count.items():
+			self.cuisine_count[cuisine] = self.cuisine_count.get(cuisine, 0) + count
+		for cuisine, counts in other.ingredient_count.items():
+			mine = self.ingredient_count.get(cuisine)
+			if mine is None:
+				self.ingredient_count[cuisine] = Counter(counts)
+				self.ingredient_total[cuisine] = other.ingredient_total[cuisine]
+			else:
+				mine.update(counts)
+				self.ingredient_total[cuisine] += other.ingredient_total[cuisine]
+		self.vocabulary.update(other.vocabulary)
+		self.num_recipes += other.num_recipes
+		return self
+
+	def _add_ingredients(self, pending):
+		for cuisine, ingredients in pending.items():
+			self._add_counts(cuisine, Counter(ingredients), len(ingredients))
+
+	def _add_counts(self, cuisine, batch, total):
+		counts = self.ingredient_count.get(cuisine)
+		if counts is None:
+			self.ingredient_count[cuisine] = batch
+			self.ingredient_total[cuisine] = total
+		else:
+			counts.update(batch)
+			self.ingredient_total[cuisine] += total
+		self.vocabulary.update(batch)
+
+	"""
+	Same output as get_cuisine_probs(data).
+	"""
+	def get_cuisine_probs(self):
+		num_recipes = float(self.num_recipes)
+		return {cuisine : count/num_recipes for (cuisine, count) in self.cuisine_count.items()}
+
+	"""
+	Same output as naive_bayes_example.get_ingredient_prob_given_cuisine(data).
+	"""
+	def get_ingredient_prob_given_cuisine(self):
+		ingredient_prob_given_cuisine = {}
+		for cuisine, counts in self.ingredient_count.items():
+			total = float(self.ingredient_total[cuisine])
+			ingredient_prob_given_cuisine[cuisine] = {ingredient : count/total for (ingredient, count) in counts.items()}
+		return ingredient_prob_given_cuisine
+
+	"""
+	Same output as robust_naive_bayes_example.get_ingredient_prob_given_cuisine(data, all_cuisines, all_ingredients):
+	every ingredient gets prior added to its count for every cuisine before dividing.
+	"""
+	def get_smoothed_ingredient_prob_given_cuisine(self, prior=0.15):
+		ingredient_prob_given_cuisine = {}
+		smoothing = prior*len(self.vocabulary)
+		for cuisine, counts in self.ingredient_count.items():
+			total = self.ingredient_total[cuisine] + smoothing
+			unseen = prior/total
+			probs = dict.fromkeys(self.vocabulary, unseen)
+			for ingredient, count in counts.items():
+				probs[ingredient] = (count + prior)/total
+			ingredient_prob_given_cuisine[cuisine] = probs
+		return ingredient_prob_given_cuisine
+
+	"""
+	Same output as sparse_robust_naive_bayes.get_smoothed_ingredient_counts(data, all_ingredients, prior),
+	for use with sparse_robust_naive_bayes.get_max_cuisine. The counts are shared with the trainer, not copied.
+	"""
+	def get_smoothed_counts(self, prior=0.15):
+		smoothing = prior*len(self.vocabulary)
+		totals = {cuisine : total + smoothing for (cuisine, total) in self.ingredient_total.items()}
+		return {'counts': self.ingredient_count, 'totals': totals, 'prior': prior, 'vocabulary': self.vocabulary}
+
+"""
+Same as test_classifier in the naive bayes examples, but trains with NaiveBayesTrainer.
+"""
+def test_classifier(train_file, robust=True):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+
+	trainer = NaiveBayesTrainer().fit(train_data)
+	cuisine_probs = trainer.get_cuisine_probs()
+	if robust:
+		ingredient_prob_given_cuisine = trainer.get_smoothed_ingredient_prob_given_cuisine()
+		get_max_cuisine = robust_naive_bayes_example.get_max_cuisine
+	else:
+		ingredient_prob_given_cuisine = trainer.get_ingredient_prob_given_cuisine()
+		get_max_cuisine = naive_bayes_example.get_max_cuisine
+
+	results = []
+	for recipe in test_data:
+		cuisine = get_max_cuisine(recipe['ingredients'], cuisine_probs, ingredient_prob_given_cuisine)
+		results.append((cuisine, recipe['cuisine']))
+
+	return results
+
+def _train_multi_pass(train_data, robust):
+	if not robust:
+		return naive_bayes_example.get_cuisine_probs(train_data), naive_bayes_example.get_ingredient_prob_given_cuisine(train_data)
+	cuisine_probs = robust_naive_bayes_example.get_cuisine_probs(train_data)
+	all_cuisines = [cuisine for cuisine in cuisine_probs]
+	all_ingredients = set()
+	for recipe in train_data:
+		for ingredient in recipe['ingredients']:
+			all_ingredients.add(ingredient)
+	return cuisine_probs, robust_naive_bayes_example.get_ingredient_prob_given_cuisine(train_data, all_cuisines, all_ingredients)
+
+def _train_fused(train_data, robust):
+	trainer = NaiveBayesTrainer().fit(train_data)
+	if not robust:
+		return trainer.get_cuisine_probs(), trainer.get_ingredient_prob_given_cuisine()
+	return trainer.get_cuisine_probs(), trainer.get_smoothed_ingredient_prob_given_cuisine()
+
+"""
+Times training with the separate passes in test_classifier against NaiveBayesTrainer (best of repeat
+runs each), and checks the two give the same answers on the held out recipes.
+"""
+def benchmark(train_file, robust=True, repeat=3):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+	get_max_cuisine = robust_naive_bayes_example.get_max_cuisine if robust else naive_bayes_example.get_max_cuisine
+
+	results = {}
+	answers = {}
+	for name, train in (('multi_pass', _train_multi_pass), ('fused', _train_fused)):
+		times = []
+		for _ in range(repeat):
+			start = default_timer()
+			cuisine_probs, ingredient_prob_given_cuisine = train(train_data, robust)
+			times.append(default_timer() - start)
+		answers[name] = [get_max_cuisine(recipe['ingredients'], cuisine_probs, ingredient_prob_given_cuisine) for recipe in test_data]
+		results[name] = min(times)
+
+	results['disagreements'] = sum(a != b for (a, b) in zip(answers['multi_pass'], answers['fused']))
+	print('multi pass: %.3fs, fused: %.3fs, speedup: %.1fx, disagreements: %d' % (results['multi_pass'], results['fused'],
+		results['multi_pass']/results['fused'], results['disagreements']))
+	return results
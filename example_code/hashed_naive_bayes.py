@@ -0,0 +1,190 @@
+import zlib
+from timeit import default_timer
+
+import numpy as np
+
+import sparse_robust_naive_bayes
+from fused_trainer import NaiveBayesTrainer
+from naive_bayes_example import load_data, eval_classifier
+"""
+Every other naive bayes model here keeps an entry for every ingredient string it has seen, so it keeps
+growing as new ingredients turn up, and a vocabulary has to be built and shipped with the model. This one
+uses the hashing trick instead: an ingredient is turned into a number with a hash function and only the
+number modulo num_buckets is kept, so for each cuisine there is one count per bucket, not per ingredient.
+
+	memory = num_buckets x number of cuisines counts, decided before we see any data
+	no vocabulary -> nothing to build, look up or ship except the counts
+
+The hash is zlib.crc32 of the UTF-8 bytes: it runs in C, and unlike Python's hash() for strings it
+gives the same bucket in every process and every run, so a model can be trained in one process and used
+in another.
+
+The price is collisions: two ingredients in the same bucket share their counts, so the model can't tell
+them apart. With V ingredients spread over B buckets, about V/B others land in the bucket of any given
+ingredient, so collisions stop mattering much once B is several times V. benchmark shows how accuracy
+drops as B gets smaller.
+
+Smoothing works like robust_naive_bayes_example with occupied buckets (buckets at least one training
+ingredient fell in) in place of ingredients:
+
+	p(bucket | cuisine) = (count + prior)/(total + prior * occupied buckets)
+
+With no collisions there's one occupied bucket per ingredient, so this is exactly the robust model. An
+ingredient whose bucket was never filled by any training recipe can't have been seen, so it's ignored
+like unseen ingredients in robust_naive_bayes_example. (An unseen ingredient that collides with a seen
+one gets that one's probability.)
+"""
+
+"""
+Returns the bucket of an ingredient, the same in every run.
+"""
+def bucket(ingredient, num_buckets):
+	return zlib.crc32(ingredient.encode('utf-8')) % num_buckets
+
+class HashedNaiveBayes(object):
+	"""
+	Input:
+		num_buckets -> number of buckets per cuisine
+		prior -> the starting count of every (cuisine, bucket) pair
+	"""
+	def __init__(self, num_buckets=1 << 16, prior=0.15):
+		self.num_buckets = num_buckets
+		self.prior = prior
+		self.cuisines = []
+		self.cuisine_count = np.zeros(0, dtype=np.int64)
+		# One row per cuisine, one column per bucket
+		self.counts = np.zeros((0, num_buckets), dtype=np.int64)
+		self._log_probs = None
+
+	def _cuisine_id(self, cuisine, cuisine_ids):
+		label = cuisine_ids.get(cuisine)
+		if label is None:
+			label = cuisine_ids[cuisine] = len(self.cuisines)
+			self.cuisines.append(cuisine)
+			self.cuisine_count = np.append(self.cuisine_count, 0)
+			self.counts = np.vstack([self.counts, np.zeros((1, self.num_buckets), dtype=np.int64)])
+		return label
+
+	"""
+	Adds the counts for a list (or any iterable) of recipes, batch_size ingredients at a time.
+	"""
+	def fit(self, recipes, batch_size=1 << 16):
+		cuisine_ids = {cuisine : label for (label, cuisine) in enumerate(self.cuisines)}
+		num_buckets = self.num_buckets
+		labels = []
+		buckets = []
+		for recipe in recipes:
+			label = self._cuisine_id(recipe['cuisine'], cuisine_ids)
+			self.cuisine_count[label] += 1
+			for ingredient in recipe['ingredients']:
+				labels.append(label)
+				buckets.append(zlib.crc32(ingredient.encode('utf-8')) % num_buckets)
+			if len(buckets) >= batch_size:
+				self._add(labels, buckets)
+				labels = []
+				buckets = []
+		self._add(labels, buckets)
+		self._log_probs = None
+		return self
+
+	def _add(self, labels, buckets):
+		if buckets:
+			flat = np.array(labels, dtype=np.int64)*self.num_buckets + np.array(buckets, dtype=np.int64)
+			cells, counts = np.unique(flat, return_counts=True)
+			self.counts.reshape(-1)[cells] += counts
+
+	"""
+	Returns (log_prior, log_probs): log(p(cuisine)) per cuisine and the num_buckets x cuisines table of
+	log(p(bucket | cuisine)), with 0 for buckets no training ingredient fell in (so they're ignored).
+	"""
+	def get_log_probs(self):
+		if self._log_probs is None:
+			counts = self.counts.astype(np.float64)
+			occupied = self.counts.sum(axis=0) > 0
+			# Spread the prior over the buckets that hold ingredients, like robust NB spreads it over the vocabulary
+			totals = counts.sum(axis=1) + self.prior*occupied.sum()
+			log_probs = np.log((counts + self.prior)/totals[:, None]).T
+			log_probs[~occupied] = 0
+			log_prior = np.log(self.cuisine_count/float(self.cuisine_count.sum()))
+			self._log_probs = (log_prior, np.ascontiguousarray(log_probs))
+		return self._log_probs
+
+	"""
+	Classifies a whole list of recipes in one call and returns the list of cuisines.
+	"""
+	def predict_batch(self, ingredient_lists):
+		log_prior, log_probs = self.get_log_probs()
+		num_buckets = self.num_buckets
+		offsets = np.zeros(len(ingredient_lists) + 1, dtype=np.intp)
+		buckets = []
+		for i, ingredient_list in enumerate(ingredient_lists):
+			buckets.extend(zlib.crc32(ingredient.encode('utf-8')) % num_buckets for ingredient in ingredient_list)
+			offsets[i + 1] = len(buckets)
+
+		scores = np.zeros((len(ingredient_lists), len(self.cuisines)), dtype=np.float64)
+		starts = offsets[:-1]
+		nonempty = offsets[1:] > starts
+		if nonempty.any():
+			scores[nonempty] = np.add.reduceat(log_probs[np.array(buckets, dtype=np.intp)], starts[nonempty], axis=0)
+		best = np.argmax(scores + log_prior, axis=1)
+		return [self.cuisines[j] for j in best]
+
+	def get_max_cuisine(self, ingredient_list):
+		return self.predict_batch([ingredient_list])[0]
+
+	"""
+	Bytes used by the counts and the log probability table.
+	"""
+	def nbytes(self):
+		return self.counts.nbytes + self.cuisine_count.nbytes + self.get_log_probs()[1].nbytes
+
+"""
+Returns the fraction of ingredients in vocabulary that share their bucket with at least one other one.
+"""
+def collision_rate(vocabulary, num_buckets):
+	occupancy = np.bincount([bucket(ingredient, num_buckets) for ingredient in vocabulary], minlength=num_buckets)
+	shared = occupancy[occupancy > 1].sum()
+	return shared/float(len(vocabulary) or 1)
+
+def test_classifier(train_file, num_buckets=1 << 16):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+
+	model = HashedNaiveBayes(num_buckets).fit(train_data)
+	guesses = model.predict_batch([recipe['ingredients'] for recipe in test_data])
+	return [(cuisine, recipe['cuisine']) for (cuisine, recipe) in zip(guesses, test_data)]
+
+"""
+Trains a hashed model for each bucket count on all but the last 1000 recipes and compares it with the
+exact robust model (sparse_robust_naive_bayes, same prior): fraction of training ingredients that collide,
+model size, training time, accuracy on the last 1000 and how many answers differ from the exact model.
+"""
+def benchmark(train_file, bucket_sizes=(1 << 8, 1 << 10, 1 << 12, 1 << 14, 1 << 16, 1 << 18, 1 << 20)):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+	ingredient_lists = [recipe['ingredients'] for recipe in test_data]
+	truth = [recipe['cuisine'] for recipe in test_data]
+
+	trainer = NaiveBayesTrainer().fit(train_data)
+	cuisine_probs = trainer.get_cuisine_probs()
+	smoothed = trainer.get_smoothed_counts()
+	exact = [sparse_robust_naive_bayes.get_max_cuisine(ingredients, cuisine_probs, smoothed) for ingredients in ingredient_lists]
+	print('exact:          %d ingredients, accuracy %.3f' % (len(trainer.vocabulary), eval_classifier(list(zip(exact, truth)))))
+
+	results = []
+	for num_buckets in bucket_sizes:
+		start = default_timer()
+		model = HashedNaiveBayes(num_buckets).fit(train_data)
+		model.get_log_probs()
+		train_time = default_timer() - start
+		guesses = model.predict_batch(ingredient_lists)
+
+		result = {'num_buckets': num_buckets, 'collision_rate': collision_rate(trainer.vocabulary, num_buckets), 'bytes': model.nbytes(),
+			'train_time': train_time, 'accuracy': eval_classifier(list(zip(guesses, truth))),
+			'disagreements': sum(a != b for (a, b) in zip(exact, guesses))}
+		results.append(result)
+		print('%8d buckets: %5.1f%% of ingredients collide, %8.1f KB, train %.2fs, accuracy %.3f, %d answers differ from exact' % (
+			num_buckets, 100*result['collision_rate'], result['bytes']/1e3, train_time, result['accuracy'], result['disagreements']))
+	return results
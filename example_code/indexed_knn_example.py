@@ -0,0 +1,151 @@
+import heapq
+from collections import Counter
+from timeit import default_timer
+
+from knn_example import load_data, make_ingredient_list_into_set
+import knn_example
+"""
+This is the same K-Nearest-Neighbors classifier as knn_example, but it doesn't compare a new recipe
+against every recipe it has seen. Instead, it builds an inverted index once: for every ingredient, the
+list of recipes (by position in the training data) that contain it. To score a new recipe we only walk
+the lists for its own ingredients, so recipes that share nothing with it are never looked at. The top
+K are then picked with a heap instead of sorting every score.
+
+The answers are exactly the same as knn_example.get_max_cuisine, including how ties are broken.
+"""
+
+"""
+Input: List of recipes (the training data)
+Output: The inverted index
+
+Form of Output:
+	index = {
+	'postings': {u'soy sauce': [3, 17, 52, ...],
+				 u'feta cheese': [8, 91, ...],
+				 ... },
+	'cuisines': [u'greek', u'southern_us', ...]
+	}
+
+	postings maps each ingredient to the positions of the recipes that contain it (in increasing order),
+	and cuisines[i] is the cuisine of recipe i.
+"""
+def build_index(data):
+	postings = {}
+	cuisines = []
+	for i, recipe in enumerate(data):
+		cuisines.append(recipe['cuisine'])
+		# A recipe only counts once per ingredient, just like the 'in' check in knn_example
+		for ingredient in set(recipe['ingredients']):
+			recipes = postings.get(ingredient)
+			if recipes is None:
+				recipes = postings[ingredient] = []
+			recipes.append(i)
+	return {'postings': postings, 'cuisines': cuisines}
+
+"""
+Same as build_index, but takes a corpus.Corpus instead of a list of recipes. Every recipe needs a cuisine.
+"""
+def build_index_from_corpus(corpus):
+	if any(label < 0 for label in corpus.labels):
+		raise ValueError('cannot index a recipe without a cuisine')
+	recipes_by_id = [[] for _ in corpus.ingredients]
+	for i, (label, ids) in enumerate(corpus):
+		previous = -1
+		# The ids of a recipe are sorted, so a repeated ingredient is right after the first one
+		for ingredient_id in ids:
+			if ingredient_id != previous:
+				recipes_by_id[ingredient_id].append(i)
+				previous = ingredient_id
+	postings = {ingredient : recipes for (ingredient, recipes) in zip(corpus.ingredients, recipes_by_id) if recipes}
+	cuisines = [corpus.cuisines[label] for label in corpus.labels]
+	return {'postings': postings, 'cuisines': cuisines}
+
+"""
+Input:
+	ingredients_list -> the list of ingredients from a new recipe we want to classify
+	index -> result of build_index(data)
+	k -> the number of neighbors to return
+Output:
+	The k nearest recipes as (score, position) tuples, from the furthest to the closest. This is the same
+	order knn_example gets from sorting every score and taking the last k, so ties between recipes with
+	the same score go to the one that comes later in the training data.
+
+Only recipes that share at least one ingredient get a score. If there are fewer than k of those, the
+rest are filled with score 0 recipes, latest first, which is what the full sort would have picked.
+"""
+def get_nearest_neighbors(ingredients_list, index, k):
+	postings = index['postings']
+	scores = Counter()
+	for ingredient in ingredients_list:
+		recipes = postings.get(ingredient)
+		if recipes:
+			scores.update(recipes)
+
+	neighbors = heapq.nlargest(k, ((score, i) for (i, score) in scores.items()))
+	i = len(index['cuisines']) - 1
+	while len(neighbors) < k and i >= 0:
+		if i not in scores:
+			neighbors.append((0, i))
+		i -= 1
+	neighbors.reverse()
+	return neighbors
+
+"""
+Same as knn_example.get_max_cuisine, but takes the index from build_index instead of the raw data.
+"""
+def get_max_cuisine(ingredients_list, index, k):
+	cuisines = index['cuisines']
+	top_cuisines = [cuisines[i] for (score, i) in get_nearest_neighbors(ingredients_list, index, k)]
+	counter = Counter(top_cuisines)
+	return counter.most_common(1)[0][0]
+
+"""
+Same as knn_example.test_classifier, but builds the index once and uses it for every test recipe.
+"""
+def test_classifier(train_file, k=6):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+
+	index = build_index(train_data)
+
+	results = []
+	for recipe in test_data:
+		cuisine = get_max_cuisine(recipe['ingredients'], index, k)
+		results.append((cuisine, recipe['cuisine']))
+
+	return results
+
+def eval_classifier(results):
+	return sum(a == b for (a, b) in results)/float(len(results))
+
+"""
+Times knn_example.get_max_cuisine against the indexed version on the first num_queries held out recipes
+and checks that they give the same answers.
+
+Output:
+	A dictionary with the index build time and the average seconds per query for each version.
+"""
+def benchmark(train_file, k=6, num_queries=100):
+	data = load_data(train_file)
+	train_data = make_ingredient_list_into_set(data[:-1000])
+	queries = [recipe['ingredients'] for recipe in data[-1000:][:num_queries]]
+
+	start = default_timer()
+	index = build_index(train_data)
+	build_time = default_timer() - start
+
+	start = default_timer()
+	linear = [knn_example.get_max_cuisine(ingredients, train_data, k) for ingredients in queries]
+	linear_time = (default_timer() - start)/len(queries)
+
+	start = default_timer()
+	indexed = [get_max_cuisine(ingredients, index, k) for ingredients in queries]
+	indexed_time = (default_timer() - start)/len(queries)
+
+	if linear != indexed:
+		raise AssertionError('indexed kNN disagrees with knn_example on %d queries' % sum(a != b for (a, b) in zip(linear, indexed)))
+
+	print('index build: %.3fs' % build_time)
+	print('linear scan: %.2fms/query, indexed: %.3fms/query, speedup: %.1fx' % (linear_time*1000, indexed_time*1000, linear_time/indexed_time))
+	return {'build_time': build_time, 'linear_time': linear_time, 'indexed_time': indexed_time}
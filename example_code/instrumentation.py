@@ -0,0 +1,252 @@
+import json
+import math
+import os
+import random
+import time
+from timeit import default_timer
+"""
+Lightweight timers and counters for finding out where the time goes in load, train and predict.
+
+Everything here does nothing unless instrumentation is turned on, either by setting the environment
+variable BDS_INSTRUMENT=1 before starting Python or by calling enable(). When it's off, stage() hands
+back a shared do-nothing object and instrument_naive_bayes/instrument_knn hand back the function they
+were given, so the only cost left is a function call per stage.
+
+When it's on it records:
+	- for every stage (load, train, predict, ...): number of calls, wall time, CPU time, items processed
+	- counters, like how many dictionary lookups get_max_cuisine did and how many of them missed
+	- per-recipe prediction latency, reported as p50/p95/p99
+
+report() returns everything as a dictionary; dump() writes it as JSON or in Prometheus text format.
+
+Turning it on isn't free. The naive bayes counters are worked out by checking every ingredient against
+every cuisine's dictionary again after get_max_cuisine returns, which costs about as much as the
+prediction itself. That time is taken out of the stages it happens in (so 'predict' still measures
+prediction) and shows up as its own 'instrumentation' stage instead, but the program as a whole runs
+slower.
+
+	import instrumentation, robust_naive_bayes_example
+	instrumentation.enable()
+	robust_naive_bayes_example.test_classifier('train.json')
+	print(instrumentation.to_prometheus())
+"""
+
+ENABLED = os.environ.get('BDS_INSTRUMENT', '') not in ('', '0')
+
+# Latency samples kept per name; after that a random sample of them is kept (reservoir sampling)
+MAX_SAMPLES = 100000
+
+_stages = {}
+_counters = {}
+_latencies = {}
+_random = random.Random(0)
+# Wall and CPU time spent on instrumentation's own bookkeeping, which stages leave out of their totals
+_overhead = [0.0, 0.0]
+
+def enable():
+	global ENABLED
+	ENABLED = True
+
+def disable():
+	global ENABLED
+	ENABLED = False
+
+"""
+Forgets everything recorded so far.
+"""
+def reset():
+	_stages.clear()
+	_counters.clear()
+	_latencies.clear()
+	_overhead[0] = _overhead[1] = 0.0
+
+class _Stage(object):
+	def __init__(self, name, items):
+		self.name = name
+		self.items = items
+
+	def add(self, items):
+		self.items += items
+
+	def __enter__(self):
+		self._overhead = tuple(_overhead)
+		self._wall = default_timer()
+		self._cpu = time.process_time()
+		return self
+
+	def __exit__(self, *exc_info):
+		wall = default_timer() - self._wall - (_overhead[0] - self._overhead[0])
+		cpu = time.process_time() - self._cpu - (_overhead[1] - self._overhead[1])
+		_add_stage(self.name, wall, cpu, self.items)
+		return False
+
+def _add_stage(name, wall, cpu, items):
+	totals = _stages.get(name)
+	if totals is None:
+		totals = _stages[name] = {'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0, 'items': 0}
+	totals['calls'] += 1
+	totals['wall_time'] += wall
+	totals['cpu_time'] += cpu
+	totals['items'] += items
+
+class _NullStage(object):
+	def add(self, items):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		return False
+
+_NULL_STAGE = _NullStage()
+
+"""
+Times the code inside a with block as stage name. items is how many things (recipes, say) the stage
+handles; you can also add to it inside the block:
+
+	with instrumentation.stage('load') as timer:
+		data = load_data(train_file)
+		timer.add(len(data))
+"""
+def stage(name, items=0):
+	if not ENABLED:
+		return _NULL_STAGE
+	return _Stage(name, items)
+
+"""
+Adds n to the counter called name.
+"""
+def count(name, n=1):
+	if ENABLED:
+		_counters[name] = _counters.get(name, 0) + n
+
+"""
+Records one latency sample (in seconds) for name.
+"""
+def observe(name, seconds):
+	if not ENABLED:
+		return
+	samples = _latencies.get(name)
+	if samples is None:
+		samples = _latencies[name] = {'count': 0, 'sum': 0.0, 'samples': []}
+	samples['count'] += 1
+	samples['sum'] += seconds
+	if len(samples['samples']) < MAX_SAMPLES:
+		samples['samples'].append(seconds)
+	else:
+		i = _random.randrange(samples['count'])
+		if i < MAX_SAMPLES:
+			samples['samples'][i] = seconds
+
+"""
+Wraps a naive bayes get_max_cuisine(ingredient_list, cuisine_probs, ingredient_prob_given_cuisine) so every
+call records its latency as predict_recipe and counts:
+	ingredient_lookups -> (cuisine, ingredient) probabilities looked up
+	ingredient_misses -> lookups that fell back to the .get default because the pair was never seen
+	unseen_ingredients -> ingredients that weren't seen with any cuisine
+The counting goes through every (cuisine, ingredient) pair again after get_max_cuisine returns. Its time
+is recorded as the 'instrumentation' stage and left out of any stage the call is inside.
+If instrumentation is off, returns get_max_cuisine unchanged.
+"""
+def instrument_naive_bayes(get_max_cuisine):
+	if not ENABLED:
+		return get_max_cuisine
+
+	def instrumented(ingredient_list, cuisine_probs, ingredient_prob_given_cuisine):
+		start = default_timer()
+		cuisine = get_max_cuisine(ingredient_list, cuisine_probs, ingredient_prob_given_cuisine)
+		observe('predict_recipe', default_timer() - start)
+
+		start = default_timer()
+		start_cpu = time.process_time()
+		misses = 0
+		unseen = 0
+		for ingredient in ingredient_list:
+			found = sum(ingredient in ingredient_prob_given_cuisine[cuisine_name] for cuisine_name in cuisine_probs)
+			misses += len(cuisine_probs) - found
+			unseen += found == 0
+		count('ingredient_lookups', len(ingredient_list)*len(cuisine_probs))
+		count('ingredient_misses', misses)
+		count('unseen_ingredients', unseen)
+		wall = default_timer() - start
+		cpu = time.process_time() - start_cpu
+		_overhead[0] += wall
+		_overhead[1] += cpu
+		_add_stage('instrumentation', wall, cpu, 1)
+		return cuisine
+	return instrumented
+
+"""
+Wraps knn_example.get_max_cuisine(ingredients_list, data, k) so every call records its latency as
+predict_recipe and counts the ingredient membership checks it does (ingredient_lookups). If
+instrumentation is off, returns get_max_cuisine unchanged.
+"""
+def instrument_knn(get_max_cuisine):
+	if not ENABLED:
+		return get_max_cuisine
+
+	def instrumented(ingredients_list, data, k):
+		start = default_timer()
+		cuisine = get_max_cuisine(ingredients_list, data, k)
+		observe('predict_recipe', default_timer() - start)
+		count('ingredient_lookups', len(ingredients_list)*len(data))
+		return cuisine
+	return instrumented
+
+"""
+Returns the value below which the given fraction of the sorted samples fall (nearest rank).
+"""
+def _percentile(sorted_samples, fraction):
+	if not sorted_samples:
+		return 0.0
+	rank = max(1, int(math.ceil(fraction*len(sorted_samples))))
+	return sorted_samples[rank - 1]
+
+"""
+Returns everything recorded so far:
+	{'stages': {name: {'calls', 'wall_time', 'cpu_time', 'items'}},
+	 'counters': {name: value},
+	 'latencies': {name: {'count', 'sum', 'mean', 'p50', 'p95', 'p99', 'max'}}}
+"""
+def report():
+	latencies = {}
+	for name, samples in _latencies.items():
+		ordered = sorted(samples['samples'])
+		latencies[name] = {'count': samples['count'], 'sum': samples['sum'], 'mean': samples['sum']/samples['count'],
+			'p50': _percentile(ordered, 0.50), 'p95': _percentile(ordered, 0.95), 'p99': _percentile(ordered, 0.99),
+			'max': ordered[-1]}
+	return {'stages': {name : dict(totals) for (name, totals) in _stages.items()}, 'counters': dict(_counters), 'latencies': latencies}
+
+def to_json():
+	return json.dumps(report(), indent=2, sort_keys=True)
+
+"""
+Returns the report in the Prometheus text exposition format.
+"""
+def to_prometheus(prefix='bds'):
+	data = report()
+	lines = []
+	for metric, key in (('stage_calls_total', 'calls'), ('stage_wall_seconds_total', 'wall_time'),
+			('stage_cpu_seconds_total', 'cpu_time'), ('stage_items_total', 'items')):
+		lines.append('# TYPE %s_%s counter' % (prefix, metric))
+		for name in sorted(data['stages']):
+			lines.append('%s_%s{stage="%s"} %r' % (prefix, metric, name, data['stages'][name][key]))
+	for name in sorted(data['counters']):
+		lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+		lines.append('%s_%s_total %r' % (prefix, name, data['counters'][name]))
+	for name in sorted(data['latencies']):
+		summary = data['latencies'][name]
+		lines.append('# TYPE %s_%s_seconds summary' % (prefix, name))
+		for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+			lines.append('%s_%s_seconds{quantile="%s"} %r' % (prefix, name, quantile, summary[key]))
+		lines.append('%s_%s_seconds_sum %r' % (prefix, name, summary['sum']))
+		lines.append('%s_%s_seconds_count %d' % (prefix, name, summary['count']))
+	return '\n'.join(lines) + '\n'
+
+"""
+Writes the report to filename, as JSON or (with format='prometheus') in Prometheus text format.
+"""
+def dump(filename, format='json'):
+	with open(filename, 'w') as out:
+		out.write(to_prometheus() if format == 'prometheus' else to_json())
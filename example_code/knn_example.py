@@ -1,5 +1,7 @@
 import json
 from collections import Counter
+
+import instrumentation
 """
 Loads json data into an array
 """
@@ -45,16 +47,22 @@ Test your code by running eval_classifier(test_classifier('train.json'))! You'll
 the percentage of classifications you got correct. This works best with K = 6. I get 0.674 for my classifier.
 """
 def test_classifier(train_file, k=6):
-	data = load_data(train_file)
+	with instrumentation.stage('load') as timer:
+		data = load_data(train_file)
+		timer.add(len(data))
 	train_data = data[:-1000]
 	test_data = data[-1000:]
 
-	train_data = make_ingredient_list_into_set(train_data)
+	with instrumentation.stage('train', len(train_data)):
+		train_data = make_ingredient_list_into_set(train_data)
 
+	# See instrumentation.py for what gets recorded when it's turned on
+	classify = instrumentation.instrument_knn(get_max_cuisine)
 	results = []
-	for i, recipe in enumerate(test_data):
-		cuisine = get_max_cuisine(recipe['ingredients'], train_data, k)
-		results.append((cuisine, recipe['cuisine']))
+	with instrumentation.stage('predict', len(test_data)):
+		for i, recipe in enumerate(test_data):
+			cuisine = classify(recipe['ingredients'], train_data, k)
+			results.append((cuisine, recipe['cuisine']))
 
 	return results
 
@@ -0,0 +1,212 @@
+import heapq
+import zlib
+from collections import Counter
+from timeit import default_timer
+
+import numpy as np
+
+import indexed_knn_example
+import knn_example
+from knn_example import load_data, make_ingredient_list_into_set
+"""
+knn_example.get_max_cuisine compares a new recipe against every recipe it has seen, so it gets slower
+the more recipes we keep. This file finds approximate nearest neighbors instead, using MinHash and
+locality sensitive hashing (LSH).
+
+The kNN score (number of shared ingredients) is closely related to the Jaccard similarity of the two
+ingredient sets (shared ingredients / all ingredients in either). MinHash gives every recipe a short
+signature of numbers with a useful property: two recipes agree on any one signature number with
+probability equal to their Jaccard similarity. The signature is cut into bands of rows numbers each,
+and every band goes into its own hash table. Two recipes land in the same bucket of some table if they
+agree on a whole band, which is very likely for similar recipes and very unlikely for different ones.
+
+To classify a recipe we look up its buckets, score only the recipes found there (the candidates) with
+the real kNN score, and vote among the best K, exactly like knn_example. More bands finds more true
+neighbors but checks more candidates; more rows per band does the opposite.
+"""
+
+# A Mersenne prime bigger than any 31-bit hash, for the (a*x + b) mod P hash functions
+_PRIME = (1 << 31) - 1
+
+"""
+Turns an ingredient into a number that's the same in every run (unlike Python's hash for strings).
+"""
+def _ingredient_hash(ingredient):
+	return zlib.crc32(ingredient.encode('utf-8')) % _PRIME
+
+def _hash_functions(num_hashes, seed):
+	rng = np.random.RandomState(seed)
+	a = rng.randint(1, _PRIME, size=num_hashes).astype(np.uint64)
+	b = rng.randint(0, _PRIME, size=num_hashes).astype(np.uint64)
+	return a, b
+
+"""
+Returns the MinHash signatures of a list of ingredient lists, one row per list. An empty list gets a
+signature of all _PRIME (it can't match anything).
+"""
+def get_signatures(ingredient_lists, a, b, chunk_size=2000):
+	signatures = np.full((len(ingredient_lists), len(a)), _PRIME, dtype=np.uint64)
+	for start in range(0, len(ingredient_lists), chunk_size):
+		chunk = ingredient_lists[start:start + chunk_size]
+		lengths = np.array([len(ingredients) for ingredients in chunk])
+		hashes = np.array([_ingredient_hash(ingredient) for ingredients in chunk for ingredient in ingredients], dtype=np.uint64)
+		if not len(hashes):
+			continue
+		# Every hash function applied to every ingredient, then the minimum per recipe
+		permuted = (hashes[:, None]*a + b) % _PRIME
+		starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+		nonempty = lengths > 0
+		signatures[start + np.flatnonzero(nonempty)] = np.minimum.reduceat(permuted, starts[nonempty], axis=0)
+	return signatures
+
+"""
+Input:
+	data -> List of recipes (the training data)
+	bands, rows -> the signature has bands*rows numbers, split into bands of rows numbers each
+	seed -> seed for the hash functions
+Output: The LSH index
+
+Form of Output:
+	index = {
+	'tables': one dictionary per band, mapping the band's bytes to the recipes in that bucket,
+	'ingredients': the set of ingredients of each recipe,
+	'cuisines': the cuisine of each recipe,
+	'a', 'b': the hash functions,
+	'bands', 'rows': as given,
+	'most_common_cuisine': answer for recipes that have no candidates at all
+	}
+"""
+def build_lsh_index(data, bands=32, rows=2, seed=0):
+	a, b = _hash_functions(bands*rows, seed)
+	ingredient_lists = [list(set(recipe['ingredients'])) for recipe in data]
+	signatures = get_signatures(ingredient_lists, a, b)
+
+	tables = [{} for _ in range(bands)]
+	for i, signature in enumerate(signatures):
+		if not ingredient_lists[i]:
+			continue
+		for band, table in enumerate(tables):
+			key = signature[band*rows:(band + 1)*rows].tobytes()
+			bucket = table.get(key)
+			if bucket is None:
+				bucket = table[key] = []
+			bucket.append(i)
+
+	cuisines = [recipe['cuisine'] for recipe in data]
+	return {'tables': tables, 'ingredients': [set(ingredients) for ingredients in ingredient_lists], 'cuisines': cuisines,
+		'a': a, 'b': b, 'bands': bands, 'rows': rows, 'most_common_cuisine': Counter(cuisines).most_common(1)[0][0]}
+
+"""
+Returns the positions of the training recipes that share at least one band with ingredients_list.
+"""
+def get_candidates(ingredients_list, index):
+	signature = get_signatures([list(set(ingredients_list))], index['a'], index['b'])[0]
+	rows = index['rows']
+	candidates = set()
+	for band, table in enumerate(index['tables']):
+		bucket = table.get(signature[band*rows:(band + 1)*rows].tobytes())
+		if bucket:
+			candidates.update(bucket)
+	return candidates
+
+"""
+Like indexed_knn_example.get_nearest_neighbors, but only looks at the LSH candidates: returns up to k
+(score, position) tuples from the furthest to the closest.
+"""
+def get_nearest_neighbors(ingredients_list, index, k):
+	recipes = index['ingredients']
+	scored = ((sum(1 if ingredient in recipes[i] else 0 for ingredient in ingredients_list), i) for i in get_candidates(ingredients_list, index))
+	neighbors = heapq.nlargest(k, scored)
+	neighbors.reverse()
+	return neighbors
+
+"""
+Approximate version of knn_example.get_max_cuisine. If no training recipe shares a band with the new one,
+it answers with the most common cuisine.
+"""
+def get_max_cuisine(ingredients_list, index, k):
+	neighbors = get_nearest_neighbors(ingredients_list, index, k)
+	if not neighbors:
+		return index['most_common_cuisine']
+	cuisines = index['cuisines']
+	counter = Counter([cuisines[i] for (score, i) in neighbors])
+	return counter.most_common(1)[0][0]
+
+def test_classifier(train_file, k=6, bands=32, rows=2):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+
+	index = build_lsh_index(train_data, bands, rows)
+
+	results = []
+	for recipe in test_data:
+		cuisine = get_max_cuisine(recipe['ingredients'], index, k)
+		results.append((cuisine, recipe['cuisine']))
+
+	return results
+
+"""
+Compares approximate kNN against exact kNN on the held out recipes, for each (bands, rows) setting:
+
+	recall      -> of the K neighbors found, the fraction that are as close as the K-th exact neighbor
+	               (so ties with the exact answer count as found)
+	candidates  -> average number of recipes scored per query
+	accuracy    -> fraction of held out recipes classified correctly
+	latency     -> average seconds per query
+
+The exact neighbors come from indexed_knn_example (same answers as knn_example); knn_example.get_max_cuisine
+itself is timed on the first linear_queries recipes for reference.
+"""
+def evaluate(train_file, settings=((16, 4), (32, 4), (16, 2), (32, 2), (64, 2)), k=6, num_queries=500, linear_queries=20):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:][:num_queries]
+	truth = [recipe['cuisine'] for recipe in test_data]
+
+	exact_index = indexed_knn_example.build_index(train_data)
+	exact = [indexed_knn_example.get_nearest_neighbors(recipe['ingredients'], exact_index, k) for recipe in test_data]
+	# get_max_cuisine does its own search, so only it is timed: one search and vote per query, like the LSH loop below
+	start = default_timer()
+	exact_answers = [indexed_knn_example.get_max_cuisine(recipe['ingredients'], exact_index, k) for recipe in test_data]
+	indexed_latency = (default_timer() - start)/len(test_data)
+
+	linear_data = make_ingredient_list_into_set([dict(recipe) for recipe in train_data])
+	start = default_timer()
+	for recipe in test_data[:linear_queries]:
+		knn_example.get_max_cuisine(recipe['ingredients'], linear_data, k)
+	linear_latency = (default_timer() - start)/min(linear_queries, len(test_data))
+
+	exact_accuracy = sum(a == b for (a, b) in zip(exact_answers, truth))/float(len(truth))
+	report = [{'method': 'exact (knn_example)', 'accuracy': exact_accuracy, 'latency': linear_latency, 'recall': 1.0},
+		{'method': 'exact (indexed)', 'accuracy': exact_accuracy, 'latency': indexed_latency, 'recall': 1.0}]
+	print('%-22s accuracy %.3f, %.3fms/query' % ('exact (knn_example)', exact_accuracy, linear_latency*1000))
+	print('%-22s accuracy %.3f, %.3fms/query' % ('exact (indexed)', exact_accuracy, indexed_latency*1000))
+
+	for bands, rows in settings:
+		start = default_timer()
+		index = build_lsh_index(train_data, bands, rows)
+		build_time = default_timer() - start
+
+		found = 0
+		candidates = 0
+		correct = 0
+		start = default_timer()
+		for recipe, answer, nearest in zip(test_data, truth, exact):
+			neighbors = get_nearest_neighbors(recipe['ingredients'], index, k)
+			cuisines = index['cuisines']
+			guess = Counter([cuisines[i] for (score, i) in neighbors]).most_common(1)[0][0] if neighbors else index['most_common_cuisine']
+			correct += guess == answer
+			kth_score = nearest[0][0] if nearest else 0
+			found += sum(score >= kth_score for (score, i) in neighbors)
+		latency = (default_timer() - start)/len(test_data)
+		# Counting candidates separately keeps it out of the latency
+		for recipe in test_data:
+			candidates += len(get_candidates(recipe['ingredients'], index))
+
+		result = {'method': 'minhash', 'bands': bands, 'rows': rows, 'build_time': build_time, 'recall': found/float(k*len(test_data)),
+			'candidates': candidates/float(len(test_data)), 'accuracy': correct/float(len(test_data)), 'latency': latency}
+		report.append(result)
+		print('bands %3d rows %2d:      accuracy %.3f, %.3fms/query, recall@%d %.3f, %.0f candidates/query (build %.2fs)' % (bands, rows,
+			result['accuracy'], latency*1000, k, result['recall'], result['candidates'], build_time))
+	return report
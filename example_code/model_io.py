@@ -0,0 +1,130 @@
+import json
+import struct
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+import compiled_naive_bayes
+"""
+Saves and loads compiled naive bayes models (see compiled_naive_bayes.compile_model), so a process that
+just wants to classify recipes doesn't have to load train.json and train the model again.
+
+The file is laid out like this:
+
+	8 bytes    the magic string BDSNB001, so we can tell a model file from anything else
+	8 bytes    length of the header, as a little-endian unsigned integer
+	header     JSON holding the cuisine names, the ingredient names (in id order), the array shape and,
+	           if the model has one, its model_type ('robust' or 'nb', set by parallel_predict.train)
+	padding    zeros up to the next multiple of 64 bytes
+	log_prior  one float64 per cuisine
+	log_probs  the (ingredients + 1) x cuisines float64 matrix, row after row
+
+The arrays are stored raw, so load_model can memory-map them instead of reading them: loading takes
+milliseconds whatever the size of the model, nothing is copied, and every process that loads the same
+file shares one copy of the arrays through the operating system's page cache.
+"""
+
+MAGIC = b'BDSNB001'
+ALIGNMENT = 64
+DTYPE = '<f8'
+
+"""
+Writes a compiled model to filename.
+"""
+def save_model(model, filename):
+	ingredient_ids = model['ingredient_ids']
+	ingredients = [None]*len(ingredient_ids)
+	for ingredient, i in ingredient_ids.items():
+		ingredients[i] = ingredient
+	log_probs = np.ascontiguousarray(model['log_probs'], dtype=DTYPE)
+	log_prior = np.ascontiguousarray(model['log_prior'], dtype=DTYPE)
+
+	fields = {'cuisines': model['cuisines'], 'ingredients': ingredients, 'shape': list(log_probs.shape)}
+	if model.get('model_type'):
+		fields['model_type'] = model['model_type']
+	header = json.dumps(fields).encode('utf-8')
+	start = len(MAGIC) + 8 + len(header)
+	padding = -start % ALIGNMENT
+	with open(filename, 'wb') as out:
+		out.write(MAGIC)
+		out.write(struct.pack('<Q', len(header)))
+		out.write(header)
+		out.write(b'\0'*padding)
+		out.write(log_prior.tobytes())
+		out.write(log_probs.tobytes())
+
+"""
+Returns True if filename starts with the model file magic string.
+"""
+def is_model_file(filename):
+	with open(filename, 'rb') as model_file:
+		return model_file.read(len(MAGIC)) == MAGIC
+
+"""
+Loads a model written by save_model. With mmap=True (the default) the arrays are read-only views of the
+file, and the model remembers the filename so worker processes can map the same file (see
+parallel_predict.predict_batch) instead of being sent a copy. With mmap=False the arrays are read into
+ordinary arrays.
+"""
+def load_model(filename, mmap=True):
+	with open(filename, 'rb') as model_file:
+		if model_file.read(len(MAGIC)) != MAGIC:
+			raise ValueError('%s is not a saved naive bayes model' % filename)
+		header_length, = struct.unpack('<Q', model_file.read(8))
+		header = json.loads(model_file.read(header_length).decode('utf-8'))
+
+	start = len(MAGIC) + 8 + header_length
+	start += -start % ALIGNMENT
+	cuisines = header['cuisines']
+	shape = tuple(header['shape'])
+	if mmap:
+		log_prior = np.memmap(filename, dtype=DTYPE, mode='r', offset=start, shape=(len(cuisines),))
+		log_probs = np.memmap(filename, dtype=DTYPE, mode='r', offset=start + log_prior.nbytes, shape=shape)
+	else:
+		with open(filename, 'rb') as model_file:
+			model_file.seek(start)
+			log_prior = np.fromfile(model_file, dtype=DTYPE, count=len(cuisines))
+			log_probs = np.fromfile(model_file, dtype=DTYPE, count=shape[0]*shape[1]).reshape(shape)
+
+	ingredient_ids = {ingredient : i for (i, ingredient) in enumerate(header['ingredients'])}
+	model = {'cuisines': cuisines, 'ingredient_ids': ingredient_ids, 'log_prior': log_prior, 'log_probs': log_probs}
+	if header.get('model_type'):
+		model['model_type'] = header['model_type']
+	if mmap:
+		model['filename'] = filename
+	return model
+
+"""
+Trains a model on train_file, saves it to model_file, and compares how long it takes to get a usable
+model by retraining, by loading the file and by memory-mapping it. Also checks that the loaded model
+gives exactly the same scores as the one that was saved.
+"""
+def benchmark(train_file, model_file, model_type='robust'):
+	from parallel_predict import train
+
+	start = default_timer()
+	model, predict = train(train_file, model_type)
+	train_time = default_timer() - start
+	save_model(model, model_file)
+
+	results = {'train_time': train_time}
+	data = compiled_naive_bayes.load_data(train_file)
+	ingredient_lists = [recipe['ingredients'] for recipe in data[-1000:]]
+	expected = compiled_naive_bayes.get_batch_log_scores(ingredient_lists, model)
+	for mmap in (False, True):
+		start = default_timer()
+		loaded = load_model(model_file, mmap)
+		elapsed = default_timer() - start
+		scores = compiled_naive_bayes.get_batch_log_scores(ingredient_lists, loaded)
+		if not np.array_equal(scores, expected) or loaded['cuisines'] != model['cuisines']:
+			raise AssertionError('loaded model does not match the saved one')
+		results['mmap_time' if mmap else 'read_time'] = elapsed
+
+	print('retrain %.3fs, read %.2fms, mmap %.2fms' % (train_time, results['read_time']*1000, results['mmap_time']*1000))
+	return results
+
+if __name__ == '__main__':
+	# python model_io.py train.json model.nb [robust|nb]
+	from parallel_predict import train
+	save_model(train(sys.argv[1], sys.argv[3] if len(sys.argv) > 3 else 'robust')[0], sys.argv[2])
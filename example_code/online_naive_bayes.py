@@ -0,0 +1,185 @@
+import math
+from collections import Counter
+from timeit import default_timer
+
+from fused_trainer import NaiveBayesTrainer
+from naive_bayes_example import load_data
+"""
+test_classifier retrains from scratch every time: it recomputes every probability from the whole
+dataset. When new labelled recipes keep arriving that's a lot of repeated work, since one new recipe
+only changes a handful of counts.
+
+OnlineNaiveBayes only ever keeps the raw counts (see fused_trainer.NaiveBayesTrainer). partial_fit adds
+a batch of recipes to them and forget takes a batch back out, each costing time proportional to the
+size of the batch. The probabilities are never stored: get_max_cuisine works them out from the counts
+when it needs them, using the same smoothing as robust_naive_bayes_example:
+
+	p(ingredient | cuisine) = (count + prior)/(total + prior * number of ingredients)
+
+With prior=0 you get naive_bayes_example instead (unseen ingredients get probability 0).
+"""
+
+class OnlineNaiveBayes(NaiveBayesTrainer):
+	"""
+	On top of the counts from NaiveBayesTrainer:
+		prior -> the smoothing count, 0.15 in robust_naive_bayes_example
+		version -> goes up by one every time the counts change, so anything that remembers predictions
+			(like a cache) can tell they are out of date
+	"""
+	def __init__(self, prior=0.15):
+		NaiveBayesTrainer.__init__(self)
+		self.prior = prior
+		self.version = 0
+
+	"""
+	Adds a batch of labelled recipes to the model.
+	"""
+	def partial_fit(self, recipes):
+		self.fit(recipes)
+		self.version += 1
+		return self
+
+	"""
+	Takes a batch of recipes that were added earlier back out of the model. Raises a ValueError (and
+	leaves the model unchanged) if the batch contains something the model never saw.
+	"""
+	def forget(self, recipes):
+		cuisine_batch = Counter()
+		ingredient_batch = {}
+		for recipe in recipes:
+			cuisine = recipe['cuisine']
+			cuisine_batch[cuisine] += 1
+			ingredients = ingredient_batch.get(cuisine)
+			if ingredients is None:
+				ingredients = ingredient_batch[cuisine] = []
+			ingredients.extend(recipe['ingredients'])
+		ingredient_batch = {cuisine : Counter(ingredients) for (cuisine, ingredients) in ingredient_batch.items()}
+
+		# Check everything first so a bad batch doesn't leave the counts half updated
+		for cuisine, count in cuisine_batch.items():
+			if self.cuisine_count.get(cuisine, 0) < count:
+				raise ValueError('cannot forget %d %s recipes, only %d were added' % (count, cuisine, self.cuisine_count.get(cuisine, 0)))
+			counts = self.ingredient_count[cuisine]
+			for ingredient, n in ingredient_batch[cuisine].items():
+				if counts.get(ingredient, 0) < n:
+					raise ValueError('cannot forget %s from %s recipes, it was never added' % (ingredient, cuisine))
+
+		for cuisine, count in cuisine_batch.items():
+			self.cuisine_count[cuisine] -= count
+			counts = self.ingredient_count[cuisine]
+			for ingredient, n in ingredient_batch[cuisine].items():
+				_decrement(counts, ingredient, n)
+				_decrement(self.vocabulary, ingredient, n)
+				self.ingredient_total[cuisine] -= n
+			if self.cuisine_count[cuisine] == 0:
+				del self.cuisine_count[cuisine]
+				del self.ingredient_count[cuisine]
+				del self.ingredient_total[cuisine]
+		self.num_recipes -= sum(cuisine_batch.values())
+		self.version += 1
+		return self
+
+	"""
+	Input:
+		ingredient_list -> the list of ingredients from a new recipe we want to classify
+	Output:
+		A dictionary with log(p(ingredients | cuisine)p(cuisine)) for every cuisine, worked out from the
+		current counts. A probability of 0 comes out as -inf, and nothing added yet gives an empty dictionary.
+	"""
+	def get_log_scores(self, ingredient_list):
+		prior = self.prior
+		vocabulary = self.vocabulary
+		if prior > 0:
+			# Like robust_naive_bayes_example, ignore ingredients we've never seen
+			ingredient_list = [ingredient for ingredient in ingredient_list if ingredient in vocabulary]
+		smoothing = prior*len(vocabulary)
+		scores = {}
+		if not self.num_recipes:
+			return scores
+		log_num_recipes = math.log(self.num_recipes)
+
+		for cuisine, counts in self.ingredient_count.items():
+			score = math.log(self.cuisine_count[cuisine]) - log_num_recipes
+			total = self.ingredient_total[cuisine] + smoothing
+			if not total:
+				# This cuisine's recipes had no ingredients (and with prior > 0, no recipe had any), so every
+				# ingredient left in the list has probability 0 for it
+				scores[cuisine] = -math.inf if ingredient_list else score
+				continue
+			log_total = math.log(total)
+			for ingredient in ingredient_list:
+				count = counts.get(ingredient, 0) + prior
+				if count == 0:
+					score = -math.inf
+					break
+				score += math.log(count) - log_total
+			scores[cuisine] = score
+		return scores
+
+	"""
+	Returns the most probable cuisine for the ingredient list, or None if every cuisine has probability 0
+	(or nothing has been added yet).
+	"""
+	def get_max_cuisine(self, ingredient_list):
+		if not self.num_recipes:
+			return None
+		best_cuisine = None
+		max_score = -math.inf
+		for cuisine, score in self.get_log_scores(ingredient_list).items():
+			if score > max_score:
+				max_score = score
+				best_cuisine = cuisine
+		return best_cuisine
+
+def _decrement(counts, key, n):
+	left = counts[key] - n
+	if left:
+		counts[key] = left
+	else:
+		del counts[key]
+
+"""
+Trains on everything but the last 1000 recipes in batches of batch_size, then tests on the last 1000.
+"""
+def test_classifier(train_file, batch_size=1000, prior=0.15):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+
+	model = OnlineNaiveBayes(prior)
+	for start in range(0, len(train_data), batch_size):
+		model.partial_fit(train_data[start:start + batch_size])
+
+	return [(model.get_max_cuisine(recipe['ingredients']), recipe['cuisine']) for recipe in test_data]
+
+"""
+Shows that adding a batch of recipes costs the same however big the model already is, while
+retraining from scratch grows with the size of the data. For each model size it times partial_fit and
+forget of one batch, and a full retrain with NaiveBayesTrainer plus building the smoothed table.
+"""
+def benchmark(train_file, batch_size=1000, prior=0.15):
+	data = load_data(train_file)
+	batch = data[-batch_size:]
+	rest = data[:-batch_size]
+
+	results = []
+	for size in (len(rest)//4, len(rest)//2, len(rest)):
+		model = OnlineNaiveBayes(prior).partial_fit(rest[:size])
+
+		start = default_timer()
+		model.partial_fit(batch)
+		partial_fit_time = default_timer() - start
+
+		start = default_timer()
+		model.forget(batch)
+		forget_time = default_timer() - start
+
+		start = default_timer()
+		trainer = NaiveBayesTrainer().fit(rest[:size] + batch)
+		trainer.get_cuisine_probs()
+		trainer.get_smoothed_ingredient_prob_given_cuisine(prior)
+		retrain_time = default_timer() - start
+
+		results.append({'model_size': size, 'partial_fit_time': partial_fit_time, 'forget_time': forget_time, 'retrain_time': retrain_time})
+		print('%6d recipes: partial_fit %.2fms, forget %.2fms, retrain %.2fms' % (size, partial_fit_time*1000, forget_time*1000, retrain_time*1000))
+	return results
@@ -0,0 +1,188 @@
+import argparse
+import csv
+import multiprocessing
+import sys
+from timeit import default_timer
+
+import compiled_naive_bayes
+import indexed_knn_example
+import instrumentation
+import model_io
+from fused_trainer import NaiveBayesTrainer
+from sparse_robust_naive_bayes import compile_smoothed_model
+from streaming_loader import iter_recipes
+"""
+The test_classifier functions classify one recipe at a time on one core. This file classifies a whole
+list of recipes (like data/test.json, which has an id and ingredients but no cuisine) using a pool of
+worker processes, and can write the answers out as a Kaggle submission:
+
+	python parallel_predict.py ../data/train.json ../data/test.json submission.csv --workers 4
+
+The trained model is handed to each worker once, when the worker starts (through the pool's
+initializer), instead of being pickled and sent along with every chunk of recipes. The recipes are
+then split into chunks, the workers classify the chunks in parallel, and the answers come back in the
+same order as the recipes went in.
+
+If the model was loaded from a file saved with model_io, the workers are just given the filename and
+memory-map it themselves, so they all share one copy of it. You can pass a saved model file instead of
+the training data:
+
+	python model_io.py ../data/train.json model.nb
+	python parallel_predict.py model.nb ../data/test.json submission.csv --workers 4
+"""
+
+# Set in each worker process by _init_worker
+_worker_model = None
+_worker_predict = None
+
+def _init_worker(predict, model):
+	global _worker_model, _worker_predict
+	if isinstance(model, str):
+		model = model_io.load_model(model)
+	_worker_model = model
+	_worker_predict = predict
+
+def _predict_chunk(chunk):
+	ids = [recipe_id for (recipe_id, ingredients) in chunk]
+	cuisines = _worker_predict([ingredients for (recipe_id, ingredients) in chunk], _worker_model)
+	return list(zip(ids, cuisines))
+
+def _chunks(recipes, chunk_size):
+	chunk = []
+	for recipe in recipes:
+		chunk.append((recipe['id'], recipe['ingredients']))
+		if len(chunk) == chunk_size:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+"""
+Classifies a list of ingredient lists with the kNN index. model is {'index': build_index(data), 'k': k}.
+"""
+def predict_knn(ingredient_lists, model):
+	return [indexed_knn_example.get_max_cuisine(ingredients, model['index'], model['k']) for ingredients in ingredient_lists]
+
+"""
+Input:
+	train_file -> the training data, or a model saved with model_io.save_model
+	model_type -> 'robust' (naive bayes with the prior), 'nb' (plain naive bayes) or 'knn'
+	k -> number of neighbors for 'knn'
+Output:
+	(model, predict), where predict(ingredient_lists, model) returns a list of cuisines
+
+A saved model has to be of model_type: asking for 'knn' with a naive bayes file, or for 'nb' with a file
+saved from a 'robust' model, raises a ValueError instead of quietly using the model in the file.
+"""
+def train(train_file, model_type='robust', k=6):
+	if model_io.is_model_file(train_file):
+		model = model_io.load_model(train_file)
+		# Files saved before the model type was recorded only tell us they hold some naive bayes model
+		saved_type = model.get('model_type', 'naive bayes' if model_type == 'knn' else model_type)
+		if saved_type != model_type:
+			raise ValueError('%s holds a %r model, not %r' % (train_file, saved_type, model_type))
+		return model, compiled_naive_bayes.predict_batch
+	if model_type == 'knn':
+		data = indexed_knn_example.load_data(train_file)
+		return {'index': indexed_knn_example.build_index(data), 'k': k}, predict_knn
+
+	trainer = NaiveBayesTrainer().fit(iter_recipes(train_file))
+	cuisine_probs = trainer.get_cuisine_probs()
+	if model_type == 'robust':
+		model = compile_smoothed_model(cuisine_probs, trainer.get_smoothed_counts())
+	elif model_type == 'nb':
+		model = compiled_naive_bayes.compile_model(cuisine_probs, trainer.get_ingredient_prob_given_cuisine(), default_prob=0)
+	else:
+		raise ValueError('unknown model type %r' % model_type)
+	model['model_type'] = model_type
+	return model, compiled_naive_bayes.predict_batch
+
+"""
+Input:
+	recipes -> list (or iterator, like iter_recipes) of recipes with 'id' and 'ingredients'
+	model, predict -> result of train
+	workers -> number of worker processes (1 classifies in this process)
+	chunk_size -> number of recipes sent to a worker at a time
+Output:
+	A generator of (id, cuisine) tuples, in the same order as recipes
+"""
+def predict_batch(recipes, model, predict=compiled_naive_bayes.predict_batch, workers=1, chunk_size=500):
+	if workers <= 1:
+		_init_worker(predict, model)
+		for chunk in _chunks(recipes, chunk_size):
+			for result in _predict_chunk(chunk):
+				yield result
+		return
+
+	# Memory-mapped models are shared by filename rather than copied to every worker
+	pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(predict, model.get('filename', model)))
+	try:
+		for results in pool.imap(_predict_chunk, _chunks(recipes, chunk_size)):
+			for result in results:
+				yield result
+	finally:
+		pool.terminate()
+		pool.join()
+
+"""
+Writes (id, cuisine) results as a Kaggle submission CSV.
+"""
+def write_submission(results, filename):
+	with open(filename, 'w') as out:
+		writer = csv.writer(out, lineterminator='\n')
+		writer.writerow(['id', 'cuisine'])
+		for recipe_id, cuisine in results:
+			writer.writerow([recipe_id, cuisine])
+
+"""
+Times predict_batch on test_file with 1, 2, 4, ... up to max_workers worker processes.
+"""
+def benchmark_scaling(train_file, test_file, model_type='knn', max_workers=None, k=6):
+	max_workers = max_workers or multiprocessing.cpu_count()
+	model, predict = train(train_file, model_type, k)
+	recipes = list(iter_recipes(test_file))
+
+	results = []
+	baseline = None
+	workers = 1
+	while workers <= max_workers:
+		start = default_timer()
+		for _ in predict_batch(recipes, model, predict, workers):
+			pass
+		elapsed = default_timer() - start
+		baseline = baseline or elapsed
+		results.append({'workers': workers, 'time': elapsed, 'recipes_per_second': len(recipes)/elapsed})
+		print('%2d workers: %.2fs, %.0f recipes/s, speedup %.2fx' % (workers, elapsed, len(recipes)/elapsed, baseline/elapsed))
+		workers *= 2
+	return results
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Classify recipes in parallel and write a Kaggle submission.')
+	parser.add_argument('train_file')
+	parser.add_argument('test_file')
+	parser.add_argument('output_file')
+	parser.add_argument('--model', choices=['robust', 'nb', 'knn'], default='robust')
+	parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+	parser.add_argument('--chunk-size', type=int, default=500)
+	parser.add_argument('-k', type=int, default=6, help='number of neighbors for --model knn')
+	parser.add_argument('--metrics', help='turn on instrumentation and write the report to this file')
+	parser.add_argument('--metrics-format', choices=['json', 'prometheus'], default='json')
+	args = parser.parse_args(argv)
+
+	if args.metrics:
+		instrumentation.enable()
+	with instrumentation.stage('train'):
+		model, predict = train(args.train_file, args.model, args.k)
+	with instrumentation.stage('predict') as timer:
+		results = predict_batch(iter_recipes(args.test_file), model, predict, args.workers, args.chunk_size)
+		write_submission(_counted(results, timer), args.output_file)
+	if args.metrics:
+		instrumentation.dump(args.metrics, args.metrics_format)
+
+def _counted(results, timer):
+	for result in results:
+		timer.add(1)
+		yield result
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,172 @@
+import random
+from collections import OrderedDict
+from timeit import default_timer
+
+import indexed_knn_example
+from online_naive_bayes import OnlineNaiveBayes
+from naive_bayes_example import load_data
+"""
+Lots of the recipes we're asked to classify have the same ingredients as one we've already classified,
+just listed in a different order. PredictionCache sits in front of any get_max_cuisine and remembers
+the answers for the most recently used ingredient sets, so repeats don't get scored again.
+
+The cache key is the sorted list of ingredients, so the order they're listed in doesn't matter but
+repeats do (naive bayes counts a repeated ingredient twice, so "salt, salt, egg" and "salt, egg" can get
+different answers). On a miss the classifier gets the caller's list as it is, so turning the cache on
+never changes an answer. When the cache is full, the ingredient list that was used longest ago is
+thrown out.
+
+If the model changes, every remembered answer might be wrong. Pass a version function that returns
+something that changes whenever the model does (OnlineNaiveBayes.version, for example) and the cache
+empties itself the next time it's used. The dictionary and compiled models have no version of their own,
+but retraining them builds new dictionaries rather than changing the old ones, so cache_model uses the
+model objects themselves as the version: give it a function returning the current model and the cache
+empties itself whenever that returns different objects. Or call clear() after retraining.
+"""
+
+class PredictionCache(object):
+	"""
+	Input:
+		classify -> function taking an ingredient list and returning a cuisine
+		capacity -> how many ingredient lists to remember
+		version -> optional function returning the current model version
+	"""
+	def __init__(self, classify, capacity=10000, version=None):
+		self.classify = classify
+		self.capacity = capacity
+		self.version = version
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.invalidations = 0
+		self._cache = OrderedDict()
+		self._version = version() if version else None
+
+	"""
+	Returns the cached cuisine for ingredient_list, classifying it first if it isn't cached.
+	"""
+	def get_max_cuisine(self, ingredient_list):
+		if self.version is not None:
+			version = self.version()
+			if version != self._version:
+				self._version = version
+				if self._cache:
+					self._cache.clear()
+					self.invalidations += 1
+
+		key = canonical_key(ingredient_list)
+		cache = self._cache
+		if key in cache:
+			cache.move_to_end(key)
+			self.hits += 1
+			return cache[key]
+
+		self.misses += 1
+		cuisine = self.classify(ingredient_list)
+		cache[key] = cuisine
+		if len(cache) > self.capacity:
+			cache.popitem(last=False)
+			self.evictions += 1
+		return cuisine
+
+	"""
+	Forgets every cached answer. Counts as an invalidation, like a version change.
+	"""
+	def clear(self):
+		self._cache.clear()
+		self.invalidations += 1
+
+	"""
+	Returns the hit, miss, eviction and invalidation counters plus the current size and hit rate.
+	"""
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'invalidations': self.invalidations,
+			'size': len(self._cache), 'hit_rate': self.hits/float(lookups) if lookups else 0.0}
+
+"""
+The cache key for an ingredient list: its ingredients in sorted order, repeats included.
+"""
+def canonical_key(ingredient_list):
+	return tuple(sorted(ingredient_list))
+
+"""
+Returns a PredictionCache in front of an OnlineNaiveBayes model that empties itself whenever the model
+is updated with partial_fit or forget.
+"""
+def cache_online_model(model, capacity=10000):
+	return PredictionCache(model.get_max_cuisine, capacity, version=lambda: model.version)
+
+"""
+Returns a PredictionCache in front of a classifier whose model gets replaced by retraining, like the
+dictionary and compiled naive bayes models.
+
+Input:
+	get_max_cuisine -> function taking an ingredient list followed by the model
+	get_model -> function returning the current model as a tuple of the arguments that follow the
+		ingredient list, e.g. lambda: (cuisine_probs, ingredient_prob_given_cuisine) for
+		robust_naive_bayes_example or lambda: (compiled,) for compiled_naive_bayes
+	capacity -> how many ingredient lists to remember
+
+The cache is emptied whenever get_model returns a different object for any of the arguments. The current
+model is kept here so its objects can't be freed and have their ids reused. A model changed in place
+isn't noticed; call clear() for that.
+"""
+def cache_model(get_max_cuisine, get_model, capacity=10000):
+	state = {'model': get_model(), 'version': 0}
+
+	def version():
+		model = get_model()
+		if len(model) != len(state['model']) or any(new is not old for (new, old) in zip(model, state['model'])):
+			state['model'] = model
+			state['version'] += 1
+		return state['version']
+
+	return PredictionCache(lambda ingredients: get_max_cuisine(ingredients, *state['model']), capacity, version)
+
+"""
+Makes a skewed stream of num_queries queries out of the held out recipes: the i-th recipe is picked
+with probability proportional to 1/i^skew (a Zipf distribution), and each query lists its ingredients
+in a random order.
+"""
+def make_skewed_queries(recipes, num_queries, skew=1.1, seed=0):
+	rng = random.Random(seed)
+	weights = [1.0/(i + 1)**skew for i in range(len(recipes))]
+	queries = []
+	for recipe in rng.choices(recipes, weights, k=num_queries):
+		ingredients = list(recipe['ingredients'])
+		rng.shuffle(ingredients)
+		queries.append(ingredients)
+	return queries
+
+"""
+Replays a skewed query stream (see make_skewed_queries) against naive bayes (OnlineNaiveBayes) and kNN
+(indexed_knn_example) with and without a cache, and reports the average latency and the cache counters.
+"""
+def benchmark(train_file, num_queries=20000, capacity=500, skew=1.1, k=6):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	queries = make_skewed_queries(data[-1000:], num_queries, skew)
+
+	model = OnlineNaiveBayes().partial_fit(train_data)
+	index = indexed_knn_example.build_index(train_data)
+	classifiers = (('naive bayes', model.get_max_cuisine, lambda: model.version),
+		('knn', lambda ingredients: indexed_knn_example.get_max_cuisine(ingredients, index, k), None))
+
+	results = {}
+	for name, classify, version in classifiers:
+		start = default_timer()
+		for ingredients in queries:
+			classify(ingredients)
+		uncached = (default_timer() - start)/num_queries
+
+		cache = PredictionCache(classify, capacity, version)
+		start = default_timer()
+		for ingredients in queries:
+			cache.get_max_cuisine(ingredients)
+		cached = (default_timer() - start)/num_queries
+
+		results[name] = dict(cache.stats(), uncached_latency=uncached, cached_latency=cached)
+		print('%-11s uncached %.1fus, cached %.1fus, speedup %.1fx, hit rate %.2f, evictions %d' % (name, uncached*1e6,
+			cached*1e6, uncached/cached, results[name]['hit_rate'], results[name]['evictions']))
+	return results
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import json
+import math
+import sys
+from timeit import default_timer
+
+from parallel_predict import train
+from streaming_loader import iter_recipes
+"""
+A small HTTP server that classifies recipes, using nothing but the standard library (asyncio).
+
+	python prediction_service.py serve ../data/train.json --port 8080
+	curl -d '{"ingredients": ["soy sauce", "ginger", "rice"]}' localhost:8080/predict
+	{"cuisine": "chinese"}
+
+Scoring recipes one at a time pays the Python overhead of get_max_cuisine for every single request.
+Instead, requests that arrive at about the same time are collected into a micro-batch - up to
+max_batch_size recipes, waiting at most max_wait seconds for more after the first one arrives - and the
+whole batch is scored with one call to the vectorized predict_batch (see compiled_naive_bayes).
+
+Requests wait in a queue that holds at most max_queue recipes. When it's full the server answers 503
+straight away rather than letting requests pile up (backpressure), so clients know to slow down.
+
+The same file also has a load generator that reports throughput and tail latency:
+
+	python prediction_service.py load-test ../data/test.json --port 8080 --concurrency 1 8 32 128
+"""
+
+class QueueFull(Exception):
+	pass
+
+class MicroBatcher(object):
+	"""
+	Input:
+		predict -> function taking (ingredient_lists, model) and returning a list of cuisines
+		model -> the trained model
+		max_batch_size -> most recipes scored in one call
+		max_wait -> longest (in seconds) the first recipe of a batch waits for more to arrive
+		max_queue -> most recipes allowed to wait before new ones are turned away
+	"""
+	def __init__(self, predict, model, max_batch_size=64, max_wait=0.002, max_queue=1024):
+		self.predict = predict
+		self.model = model
+		self.max_batch_size = max_batch_size
+		self.max_wait = max_wait
+		self.queue = asyncio.Queue(max_queue)
+		self.batches = 0
+		self.recipes = 0
+		self.rejected = 0
+
+	"""
+	Classifies one ingredient list. Raises QueueFull if too many recipes are already waiting.
+	"""
+	async def classify(self, ingredients):
+		future = asyncio.get_running_loop().create_future()
+		try:
+			self.queue.put_nowait((ingredients, future))
+		except asyncio.QueueFull:
+			self.rejected += 1
+			raise QueueFull()
+		return await future
+
+	"""
+	Collects batches from the queue and scores them, forever.
+	"""
+	async def run(self):
+		loop = asyncio.get_running_loop()
+		while True:
+			batch = [await self.queue.get()]
+			deadline = loop.time() + self.max_wait
+			while len(batch) < self.max_batch_size:
+				timeout = deadline - loop.time()
+				if timeout <= 0:
+					break
+				try:
+					batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+				except asyncio.TimeoutError:
+					break
+
+			# Score in a thread so the server keeps accepting requests in the meantime
+			ingredient_lists = [ingredients for (ingredients, future) in batch]
+			try:
+				cuisines = await loop.run_in_executor(None, self.predict, ingredient_lists, self.model)
+			except Exception:
+				# Score the recipes one at a time, so one that can't be scored doesn't fail the others
+				cuisines = await loop.run_in_executor(None, _predict_each, self.predict, ingredient_lists, self.model)
+			for (ingredients, future), cuisine in zip(batch, cuisines):
+				if future.done():
+					continue
+				if isinstance(cuisine, Exception):
+					future.set_exception(cuisine)
+				else:
+					future.set_result(cuisine)
+			self.batches += 1
+			self.recipes += len(batch)
+
+	def stats(self):
+		return {'batches': self.batches, 'recipes': self.recipes, 'rejected': self.rejected, 'queued': self.queue.qsize(),
+			'mean_batch_size': self.recipes/float(self.batches) if self.batches else 0.0}
+
+"""
+Scores each ingredient list on its own. Returns a list holding the cuisine for each one, or the exception
+scoring it raised.
+"""
+def _predict_each(predict, ingredient_lists, model):
+	results = []
+	for ingredients in ingredient_lists:
+		try:
+			results.append(predict([ingredients], model)[0])
+		except Exception as error:
+			results.append(error)
+	return results
+
+"""
+Returns True if value is a list of ingredient strings, the only thing /predict accepts.
+"""
+def _is_ingredient_list(value):
+	return isinstance(value, list) and all(isinstance(ingredient, str) for ingredient in value)
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+async def _read_request(reader):
+	request_line = await reader.readline()
+	if not request_line:
+		return None
+	method, path, _ = request_line.decode('latin-1').split(' ', 2)
+	headers = {}
+	while True:
+		line = await reader.readline()
+		if line in (b'\r\n', b'\n', b''):
+			break
+		name, _, value = line.decode('latin-1').partition(':')
+		headers[name.strip().lower()] = value.strip()
+	body = await reader.readexactly(int(headers.get('content-length', 0)))
+	return method, path, headers, body
+
+def _response(status, payload, keep_alive=True):
+	body = json.dumps(payload).encode('utf-8')
+	head = 'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n' % (
+		status, _REASONS[status], len(body), 'keep-alive' if keep_alive else 'close')
+	return head.encode('latin-1') + body
+
+"""
+Returns the asyncio connection handler for a server in front of batcher. It understands:
+	POST /predict with {"ingredients": [...]}  ->  {"cuisine": ...} (400 unless ingredients is a list of strings)
+	GET /stats                                  ->  batching and backpressure counters
+"""
+def make_handler(batcher):
+	async def handle(reader, writer):
+		try:
+			while True:
+				try:
+					request = await _read_request(reader)
+				except (ValueError, asyncio.IncompleteReadError):
+					writer.write(_response(400, {'error': 'malformed request'}, keep_alive=False))
+					break
+				if request is None:
+					break
+				method, path, headers, body = request
+				keep_alive = headers.get('connection', '').lower() != 'close'
+
+				if method == 'POST' and path == '/predict':
+					try:
+						ingredients = json.loads(body.decode('utf-8'))['ingredients']
+					except (ValueError, KeyError, TypeError):
+						ingredients = None
+					if not _is_ingredient_list(ingredients):
+						writer.write(_response(400, {'error': 'expected {"ingredients": ["...", ...]}'}, keep_alive))
+					else:
+						try:
+							cuisine = await batcher.classify(ingredients)
+							writer.write(_response(200, {'cuisine': cuisine}, keep_alive))
+						except QueueFull:
+							writer.write(_response(503, {'error': 'too many requests waiting'}, keep_alive))
+						except Exception:
+							writer.write(_response(500, {'error': 'could not classify recipe'}, keep_alive))
+				elif method == 'GET' and path == '/stats':
+					writer.write(_response(200, batcher.stats(), keep_alive))
+				else:
+					writer.write(_response(404, {'error': 'not found'}, keep_alive))
+				await writer.drain()
+				if not keep_alive:
+					break
+		except ConnectionError:
+			pass
+		except Exception:
+			# Anything else: answer rather than dropping the connection without a word
+			try:
+				writer.write(_response(500, {'error': 'internal error'}, keep_alive=False))
+				await writer.drain()
+			except ConnectionError:
+				pass
+		finally:
+			writer.close()
+	return handle
+
+"""
+Trains (or loads, see model_io) a model and serves it on host:port until interrupted.
+"""
+async def serve(train_file, model_type='robust', host='127.0.0.1', port=8080, max_batch_size=64, max_wait=0.002, max_queue=1024, k=6):
+	model, predict = train(train_file, model_type, k)
+	batcher = MicroBatcher(predict, model, max_batch_size, max_wait, max_queue)
+	batch_task = asyncio.ensure_future(batcher.run())
+	server = await asyncio.start_server(make_handler(batcher), host, port)
+	print('serving %s model on http://%s:%d/predict' % (model_type, host, port))
+	try:
+		async with server:
+			await server.serve_forever()
+	finally:
+		batch_task.cancel()
+
+async def _client(host, port, requests, latencies, statuses):
+	reader, writer = await asyncio.open_connection(host, port)
+	try:
+		for ingredients in requests:
+			body = json.dumps({'ingredients': ingredients}).encode('utf-8')
+			start = default_timer()
+			writer.write(('POST /predict HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+				% (host, len(body))).encode('latin-1') + body)
+			await writer.drain()
+			status = int((await reader.readline()).split()[1])
+			length = 0
+			while True:
+				line = await reader.readline()
+				if line in (b'\r\n', b'\n', b''):
+					break
+				name, _, value = line.decode('latin-1').partition(':')
+				if name.strip().lower() == 'content-length':
+					length = int(value)
+			await reader.readexactly(length)
+			if status == 200:
+				latencies.append(default_timer() - start)
+			statuses[status] = statuses.get(status, 0) + 1
+	finally:
+		writer.close()
+
+def _percentile(sorted_samples, fraction):
+	if not sorted_samples:
+		return 0.0
+	return sorted_samples[max(1, int(math.ceil(fraction*len(sorted_samples)))) - 1]
+
+"""
+Sends num_requests requests from concurrency clients at once (each client sends its next request as
+soon as it gets an answer), cycling through ingredient_lists. Throughput and latency percentiles only
+count requests that were answered with a cuisine (status 200); the fraction turned away because the
+queue was full (status 503) is reported separately as rejection_rate.
+"""
+async def load_test(ingredient_lists, host='127.0.0.1', port=8080, concurrency=8, num_requests=2000):
+	per_client = [[] for _ in range(concurrency)]
+	for i in range(num_requests):
+		per_client[i % concurrency].append(ingredient_lists[i % len(ingredient_lists)])
+	latencies = []
+	statuses = {}
+
+	start = default_timer()
+	await asyncio.gather(*[_client(host, port, requests, latencies, statuses) for requests in per_client])
+	elapsed = default_timer() - start
+
+	latencies.sort()
+	result = {'concurrency': concurrency, 'requests': num_requests, 'served': len(latencies), 'time': elapsed,
+		'throughput': len(latencies)/elapsed, 'rejection_rate': statuses.get(503, 0)/float(num_requests or 1),
+		'p50': _percentile(latencies, 0.50), 'p95': _percentile(latencies, 0.95), 'p99': _percentile(latencies, 0.99),
+		'statuses': statuses}
+	print('concurrency %4d: %7.0f served/s, p50 %6.2fms, p95 %6.2fms, p99 %6.2fms, rejected %.1f%%' % (concurrency, result['throughput'],
+		result['p50']*1000, result['p95']*1000, result['p99']*1000, 100*result['rejection_rate']))
+	return result
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Recipe classification service with micro-batching.')
+	commands = parser.add_subparsers(dest='command')
+	serve_parser = commands.add_parser('serve', help='run the server')
+	serve_parser.add_argument('train_file', help='training data, or a model saved with model_io')
+	serve_parser.add_argument('--model', choices=['robust', 'nb', 'knn'], default='robust')
+	serve_parser.add_argument('-k', type=int, default=6, help='number of neighbors for --model knn')
+	serve_parser.add_argument('--max-batch-size', type=int, default=64)
+	serve_parser.add_argument('--max-wait', type=float, default=0.002, help='seconds to wait to fill a batch')
+	serve_parser.add_argument('--max-queue', type=int, default=1024)
+	load_parser = commands.add_parser('load-test', help='measure throughput and latency of a running server')
+	load_parser.add_argument('recipes_file', help='recipes to send, e.g. ../data/test.json')
+	load_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+	load_parser.add_argument('--requests', type=int, default=2000)
+	for command_parser in (serve_parser, load_parser):
+		command_parser.add_argument('--host', default='127.0.0.1')
+		command_parser.add_argument('--port', type=int, default=8080)
+	args = parser.parse_args(argv)
+
+	if args.command == 'serve':
+		asyncio.run(serve(args.train_file, args.model, args.host, args.port, args.max_batch_size, args.max_wait, args.max_queue, args.k))
+	elif args.command == 'load-test':
+		ingredient_lists = [recipe['ingredients'] for recipe in iter_recipes(args.recipes_file)]
+		for concurrency in args.concurrency:
+			asyncio.run(load_test(ingredient_lists, args.host, args.port, concurrency, args.requests))
+	else:
+		parser.print_help()
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,190 @@
+import json
+import struct
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+import compiled_naive_bayes
+import model_io
+import robust_naive_bayes_example
+from naive_bayes_example import load_data, eval_classifier
+"""
+A compiled model (see compiled_naive_bayes) keeps log(p(ingredient | cuisine)) as float64: 8 bytes for
+every ingredient and cuisine. With a big vocabulary that table is far bigger than the CPU cache, so
+scoring spends its time waiting on memory rather than adding, and every worker process pulls its own
+share through the cache.
+
+This file stores the table with fewer bytes per number:
+
+	float16 -> 2 bytes. Log probabilities keep about 3 significant digits; sums are done in float32.
+	int8    -> 1 byte. Each cuisine (column) gets its own scale, and log_prob is stored as the whole
+	           number round(log_prob/scale) between -127 and 0. A recipe's ingredients are added up as
+	           whole numbers (int32), and only the total is multiplied by the scale.
+
+The rounding can change the answer when two cuisines score almost the same, so benchmark counts how
+often the quantized model disagrees with the full precision get_max_cuisine.
+
+An int8 table can't hold -inf (log(0), from plain naive bayes), so -inf is clipped to the smallest
+finite log probability: "impossible" becomes "as unlikely as anything we've seen", and the quantized
+model never returns None. The robust model has no -inf, so nothing changes there.
+"""
+
+MAGIC = b'BDSNBQ01'
+
+"""
+Input:
+	model -> result of compiled_naive_bayes.compile_model (or model_io.load_model)
+	dtype -> 'int8' or 'float16'
+Output: The quantized model
+
+Form of Output:
+	quantized = {
+	'cuisines', 'ingredient_ids', 'log_prior': the same as in model,
+	'dtype': 'int8' or 'float16',
+	'log_probs': the (ingredients + 1) x cuisines table as int8 or float16,
+	'scales': for int8, one float64 per cuisine so that log_prob is about log_probs*scale (None for float16)
+	}
+"""
+def quantize_model(model, dtype='int8'):
+	log_probs = np.asarray(model['log_probs'], dtype=np.float64)
+	quantized = {'cuisines': model['cuisines'], 'ingredient_ids': model['ingredient_ids'],
+		'log_prior': np.asarray(model['log_prior'], dtype=np.float64), 'dtype': dtype}
+
+	if dtype == 'float16':
+		quantized['log_probs'] = log_probs.astype(np.float16)
+		quantized['scales'] = None
+	elif dtype == 'int8':
+		finite = np.isfinite(log_probs)
+		floor = log_probs[finite].min() if finite.any() else 0.0
+		clipped = np.where(finite, log_probs, floor)
+		scales = -clipped.min(axis=0)/127.0
+		# A cuisine where every log prob is 0 can use any scale
+		scales[scales == 0] = 1.0
+		quantized['log_probs'] = np.round(clipped/scales).astype(np.int8)
+		quantized['scales'] = scales
+	else:
+		raise ValueError('dtype must be int8 or float16, not %r' % dtype)
+	return quantized
+
+"""
+Same as compiled_naive_bayes.get_batch_log_scores, but for a quantized model. The table is read in its
+small form and added up as int32 (int8) or float32 (float16).
+"""
+def get_batch_log_scores(ingredient_lists, quantized):
+	ids, offsets = compiled_naive_bayes.encode_batch(ingredient_lists, quantized)
+	log_probs = quantized['log_probs']
+	total_dtype = np.int32 if quantized['dtype'] == 'int8' else np.float32
+	totals = np.zeros((len(ingredient_lists), log_probs.shape[1]), dtype=total_dtype)
+
+	starts = offsets[:-1]
+	nonempty = offsets[1:] > starts
+	if nonempty.any():
+		totals[nonempty] = np.add.reduceat(log_probs[ids], starts[nonempty], axis=0, dtype=total_dtype)
+
+	if quantized['scales'] is not None:
+		return totals*quantized['scales'] + quantized['log_prior']
+	return totals + quantized['log_prior']
+
+"""
+Classifies a whole list of recipes in one call, like compiled_naive_bayes.predict_batch.
+"""
+def predict_batch(ingredient_lists, quantized):
+	scores = get_batch_log_scores(ingredient_lists, quantized)
+	best = np.argmax(scores, axis=1)
+	cuisines = quantized['cuisines']
+	return [None if scores[i, j] == -np.inf else cuisines[j] for (i, j) in enumerate(best)]
+
+def get_max_cuisine(ingredient_list, quantized):
+	return predict_batch([ingredient_list], quantized)[0]
+
+"""
+Writes a quantized model to filename. The layout is the same as model_io.save_model (magic, header length,
+JSON header, padding to 64 bytes, then the raw arrays), with the magic string BDSNBQ01, the dtype in the
+header, and for int8 the scales stored right after log_prior.
+"""
+def save_quantized_model(quantized, filename):
+	ingredients = [None]*len(quantized['ingredient_ids'])
+	for ingredient, i in quantized['ingredient_ids'].items():
+		ingredients[i] = ingredient
+	log_probs = np.ascontiguousarray(quantized['log_probs'])
+
+	header = json.dumps({'cuisines': quantized['cuisines'], 'ingredients': ingredients, 'shape': list(log_probs.shape),
+		'dtype': quantized['dtype']}).encode('utf-8')
+	start = len(MAGIC) + 8 + len(header)
+	with open(filename, 'wb') as out:
+		out.write(MAGIC)
+		out.write(struct.pack('<Q', len(header)))
+		out.write(header)
+		out.write(b'\0'*(-start % model_io.ALIGNMENT))
+		out.write(np.ascontiguousarray(quantized['log_prior'], dtype='<f8').tobytes())
+		if quantized['scales'] is not None:
+			out.write(np.ascontiguousarray(quantized['scales'], dtype='<f8').tobytes())
+		out.write(log_probs.astype(log_probs.dtype.newbyteorder('<')).tobytes())
+
+"""
+Loads a model written by save_quantized_model, memory-mapping the table like model_io.load_model.
+"""
+def load_quantized_model(filename):
+	with open(filename, 'rb') as model_file:
+		if model_file.read(len(MAGIC)) != MAGIC:
+			raise ValueError('%s is not a saved quantized model' % filename)
+		header_length, = struct.unpack('<Q', model_file.read(8))
+		header = json.loads(model_file.read(header_length).decode('utf-8'))
+
+	offset = len(MAGIC) + 8 + header_length
+	offset += -offset % model_io.ALIGNMENT
+	cuisines = header['cuisines']
+	log_prior = np.array(np.memmap(filename, dtype='<f8', mode='r', offset=offset, shape=(len(cuisines),)))
+	offset += log_prior.nbytes
+	scales = None
+	if header['dtype'] == 'int8':
+		scales = np.array(np.memmap(filename, dtype='<f8', mode='r', offset=offset, shape=(len(cuisines),)))
+		offset += scales.nbytes
+	log_probs = np.memmap(filename, dtype='<i1' if header['dtype'] == 'int8' else '<f2', mode='r', offset=offset,
+		shape=tuple(header['shape']))
+
+	ingredient_ids = {ingredient : i for (i, ingredient) in enumerate(header['ingredients'])}
+	return {'cuisines': cuisines, 'ingredient_ids': ingredient_ids, 'log_prior': log_prior, 'dtype': header['dtype'],
+		'log_probs': log_probs, 'scales': scales}
+
+"""
+Trains the robust model on all but the last 1000 recipes and, on those 1000, compares the full precision
+robust_naive_bayes_example.get_max_cuisine with the float64, float16 and int8 compiled models:
+disagreements with the full precision answer, accuracy, table size and batch scoring time (best of repeats).
+"""
+def benchmark(train_file, repeats=5):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+	ingredient_lists = [recipe['ingredients'] for recipe in test_data]
+	truth = [recipe['cuisine'] for recipe in test_data]
+
+	cuisine_probs = robust_naive_bayes_example.get_cuisine_probs(train_data)
+	all_ingredients = set(ingredient for recipe in train_data for ingredient in recipe['ingredients'])
+	ingredient_prob_given_cuisine = robust_naive_bayes_example.get_ingredient_prob_given_cuisine(train_data, list(cuisine_probs), all_ingredients)
+	original = [robust_naive_bayes_example.get_max_cuisine(ingredients, cuisine_probs, ingredient_prob_given_cuisine) for ingredients in ingredient_lists]
+	model = compiled_naive_bayes.compile_model(cuisine_probs, ingredient_prob_given_cuisine, default_prob=1)
+
+	candidates = [('float64', model, compiled_naive_bayes.predict_batch)]
+	for dtype in ('float16', 'int8'):
+		candidates.append((dtype, quantize_model(model, dtype), predict_batch))
+
+	results = {}
+	for name, candidate, predict in candidates:
+		elapsed = float('inf')
+		for _ in range(repeats):
+			start = default_timer()
+			guesses = predict(ingredient_lists, candidate)
+			elapsed = min(elapsed, default_timer() - start)
+		# The originals can be None when the product underflows; those are left out of the comparison
+		disagreements = sum(a != b for (a, b) in zip(original, guesses) if a is not None)
+		results[name] = {'table_bytes': candidate['log_probs'].nbytes, 'time': elapsed, 'disagreements': disagreements,
+			'accuracy': eval_classifier(list(zip(guesses, truth)))}
+		print('%-8s table %8.1f KB, %.2fms for %d recipes, accuracy %.3f, %d disagreements with get_max_cuisine' % (name,
+			candidate['log_probs'].nbytes/1e3, elapsed*1000, len(ingredient_lists), results[name]['accuracy'], disagreements))
+	return results
+
+if __name__ == '__main__':
+	# python quantized_naive_bayes.py model.nb model.nbq [int8|float16]
+	save_quantized_model(quantize_model(model_io.load_model(sys.argv[1]), sys.argv[3] if len(sys.argv) > 3 else 'int8'), sys.argv[2])
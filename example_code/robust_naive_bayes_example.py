@@ -1,4 +1,6 @@
 import json
+
+import instrumentation
 """
 ***************************************** DIFFERENCES ******************************************
 
@@ -46,14 +48,17 @@ As a sanity check, try to make sure that the sum of the cuisine probabilities is
 """
 def get_cuisine_probs(data):
 	cuisine_count = {}
+	num_recipes = 0
 
 	# Calculate number of times each ingredient and cuisine appears in the whole dataset
+	# (counting the recipes as we go means data can also be an iterator, like streaming_loader.iter_recipes)
 	for recipe in data:
 		cuisine = recipe['cuisine']
 		cuisine_count[cuisine] = cuisine_count.get(cuisine, 0) + 1
+		num_recipes += 1
 
 	# Divide by length of dataset
-	cuisine_probs = {cuisine : cuisine_count[cuisine]/float(len(data)) for cuisine in cuisine_count}
+	cuisine_probs = {cuisine : cuisine_count[cuisine]/float(num_recipes) for cuisine in cuisine_count}
 
 	return cuisine_probs
 
@@ -159,25 +164,30 @@ Output:
 """
 def test_classifier(train_file):
 	# Load data from training file
-	data = load_data(train_file)
+	with instrumentation.stage('load') as timer:
+		data = load_data(train_file)
+		timer.add(len(data))
 	# Split data into training and test set
 	train_data = data[:-1000]
 	test_data = data[-1000:]
 	# Train the classifier
-	cuisine_probs = get_cuisine_probs(train_data)
-	# Get list of all cuisines and all ingredients
-	all_cuisines = [cuisine for cuisine in cuisine_probs]
-	all_ingredients = set()
-	for recipe in train_data:
-		for ingredient in recipe['ingredients']:
-			all_ingredients.add(ingredient)
-	ingredient_prob_given_cuisine = get_ingredient_prob_given_cuisine(train_data, all_cuisines, all_ingredients)
-
-	# Test the classifier
+	with instrumentation.stage('train', len(train_data)):
+		cuisine_probs = get_cuisine_probs(train_data)
+		# Get list of all cuisines and all ingredients
+		all_cuisines = [cuisine for cuisine in cuisine_probs]
+		all_ingredients = set()
+		for recipe in train_data:
+			for ingredient in recipe['ingredients']:
+				all_ingredients.add(ingredient)
+		ingredient_prob_given_cuisine = get_ingredient_prob_given_cuisine(train_data, all_cuisines, all_ingredients)
+
+	# Test the classifier (see instrumentation.py for what gets recorded when it's turned on)
+	classify = instrumentation.instrument_naive_bayes(get_max_cuisine)
 	results = []
-	for recipe in test_data:
-		cuisine = get_max_cuisine(recipe['ingredients'], cuisine_probs, ingredient_prob_given_cuisine)
-		results.append((cuisine, recipe['cuisine']))
+	with instrumentation.stage('predict', len(test_data)):
+		for recipe in test_data:
+			cuisine = classify(recipe['ingredients'], cuisine_probs, ingredient_prob_given_cuisine)
+			results.append((cuisine, recipe['cuisine']))
 
 	return results
 
@@ -0,0 +1,174 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+from fused_trainer import NaiveBayesTrainer
+from streaming_loader import iter_recipes, make_large_file
+"""
+Trains naive bayes on several cores at once, map-reduce style.
+
+The counting is the only part of training that looks at the data, and counts can be added up: the
+NaiveBayesTrainer for the first half of the data merged with the one for the second half is the same
+as the NaiveBayesTrainer for all of it. So the data is split into shards, a pool of worker processes
+counts the shards at the same time (map), the counts are merged pairwise (reduce), and the
+probabilities are worked out once at the end from the merged counts. Each worker only ever holds its
+own shard's counts, never the recipes of the whole file.
+
+A shard is either a whole file (when training from several files) or a range of bytes of one JSON Lines
+file, cut at line breaks so every recipe falls in exactly one shard. A file holding one big JSON list
+can't be cut like that, so it's counted as a single shard; write it as JSON Lines to split it:
+
+	python sharded_training.py recipes.jsonl --workers 8
+	python sharded_training.py part1.json part2.json part3.json --workers 3
+
+Shards are merged in the order they come in, so the result is identical to training on everything in
+one process.
+"""
+
+"""
+A JSON list starts with '[' and a JSON Lines file with '{'. Only reads up to the first non-whitespace
+byte: a list written by json.dump is all on one line, so reading a whole line could mean the whole file.
+"""
+def _is_json_lines(filename, chunk_size=4096):
+	with open(filename, 'rb') as data_file:
+		chunk = data_file.read(chunk_size)
+		while chunk:
+			stripped = chunk.lstrip()
+			if stripped:
+				return stripped[:1] != b'['
+			chunk = data_file.read(chunk_size)
+	return True
+
+"""
+Splits a JSON Lines file into num_shards (filename, start, end) byte ranges of about the same size.
+Every range starts at the beginning of a line and ends at the beginning of the next range.
+"""
+def byte_ranges(filename, num_shards):
+	size = os.path.getsize(filename)
+	bounds = [0]
+	with open(filename, 'rb') as data_file:
+		for i in range(1, num_shards):
+			data_file.seek(max(size*i//num_shards, bounds[-1]))
+			# Move to the start of the next line, unless we're already at one
+			if data_file.tell() > 0:
+				data_file.seek(data_file.tell() - 1)
+				data_file.readline()
+			bounds.append(data_file.tell())
+	bounds.append(size)
+	return [(filename, start, end) for (start, end) in zip(bounds, bounds[1:]) if end > start]
+
+"""
+Returns the list of shards for the given files: byte ranges if there's a single JSON Lines file, one
+whole file per shard otherwise.
+"""
+def make_shards(filenames, num_shards):
+	if len(filenames) == 1 and _is_json_lines(filenames[0]):
+		return byte_ranges(filenames[0], num_shards)
+	return [(filename, None, None) for filename in filenames]
+
+def _iter_range(filename, start, end):
+	with open(filename, 'rb') as data_file:
+		data_file.seek(start)
+		position = start
+		for line in data_file:
+			if position >= end:
+				break
+			position += len(line)
+			if line.strip():
+				yield json.loads(line)
+
+"""
+Counts one shard (the map step). Runs in a worker process.
+"""
+def count_shard(shard):
+	filename, start, end = shard
+	recipes = iter_recipes(filename) if start is None else _iter_range(filename, start, end)
+	return NaiveBayesTrainer().fit(recipes)
+
+"""
+Merges a list of trainers pairwise, neighbours first (the reduce step). Every trainer is merged with
+the one after it, so the order of the shards is kept.
+"""
+def merge_all(trainers):
+	if not trainers:
+		return NaiveBayesTrainer()
+	while len(trainers) > 1:
+		merged = [trainers[i].merge(trainers[i + 1]) for i in range(0, len(trainers) - 1, 2)]
+		if len(trainers) % 2:
+			merged.append(trainers[-1])
+		trainers = merged
+	return trainers[0]
+
+"""
+Input:
+	filenames -> a list of recipe files (JSON lists or JSON Lines)
+	workers -> number of worker processes (defaults to the number of cores)
+	num_shards -> how many byte ranges to cut a single JSON Lines file into (defaults to workers)
+Output:
+	A NaiveBayesTrainer with the counts of every recipe in the files; call get_cuisine_probs,
+	get_ingredient_prob_given_cuisine etc. on it to get the probabilities.
+"""
+def train_sharded(filenames, workers=None, num_shards=None):
+	workers = workers or multiprocessing.cpu_count()
+	shards = make_shards(filenames, num_shards or workers)
+	if workers == 1:
+		return merge_all([count_shard(shard) for shard in shards])
+	with multiprocessing.Pool(workers) as pool:
+		return merge_all(pool.map(count_shard, shards, chunksize=1))
+
+"""
+Returns True if two trainers hold exactly the same counts, in the same order.
+"""
+def same_counts(a, b):
+	return (list(a.cuisine_count.items()) == list(b.cuisine_count.items()) and a.num_recipes == b.num_recipes
+		and list(a.ingredient_total.items()) == list(b.ingredient_total.items()) and a.vocabulary == b.vocabulary
+		and all(list(a.ingredient_count[cuisine].items()) == list(b.ingredient_count[cuisine].items()) for cuisine in a.cuisine_count))
+
+"""
+Writes train_file out copies times as one JSON Lines file, then times training on it in one process
+(NaiveBayesTrainer over iter_recipes) and sharded over each number of workers, checking every sharded
+result is identical to the single process one.
+"""
+def benchmark(train_file, copies=10, workers=(1, 2, 4, 8)):
+	workdir = tempfile.mkdtemp()
+	try:
+		filename = os.path.join(workdir, 'recipes.jsonl')
+		make_large_file(train_file, filename, copies, json_lines=True)
+
+		start = default_timer()
+		expected = NaiveBayesTrainer().fit(iter_recipes(filename))
+		single_time = default_timer() - start
+		print('single process: %.2fs (%d recipes)' % (single_time, expected.num_recipes))
+
+		results = {'single_process': single_time}
+		for count in workers:
+			start = default_timer()
+			trainer = train_sharded([filename], count)
+			elapsed = default_timer() - start
+			if not same_counts(trainer, expected) or trainer.get_cuisine_probs() != expected.get_cuisine_probs():
+				raise AssertionError('sharded training with %d workers differs from single process training' % count)
+			results[count] = elapsed
+			print('%2d workers:     %.2fs, speedup %.2fx' % (count, elapsed, single_time/elapsed))
+	finally:
+		shutil.rmtree(workdir)
+	print('(%d cores available)' % multiprocessing.cpu_count())
+	return results
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Count recipe files in parallel and print the cuisine probabilities.')
+	parser.add_argument('files', nargs='+', help='JSON or JSON Lines recipe files')
+	parser.add_argument('--workers', type=int, default=None)
+	parser.add_argument('--shards', type=int, default=None, help='byte ranges to split a single JSON Lines file into')
+	args = parser.parse_args(argv)
+
+	trainer = train_sharded(args.files, args.workers, args.shards)
+	for cuisine, prob in sorted(trainer.get_cuisine_probs().items(), key=lambda item: -item[1]):
+		print('%-20s %.4f' % (cuisine, prob))
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
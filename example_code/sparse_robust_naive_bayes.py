@@ -0,0 +1,180 @@
+import tracemalloc
+from timeit import default_timer
+
+import numpy as np
+
+import robust_naive_bayes_example
+from robust_naive_bayes_example import load_data, get_cuisine_probs, eval_classifier
+"""
+This is the same classifier as robust_naive_bayes_example, but it trains without filling in the prior
+for every (cuisine, ingredient) pair up front. Most ingredients never show up in most cuisines, so
+instead of a dictionary entry of 0.15 for each of them we only keep the counts we actually saw, plus
+the total count for each cuisine. The probability of an ingredient given a cuisine is then worked out
+when we need it:
+
+	p(ingredient | cuisine) = (count + prior)/(total + prior * number of ingredients)
+
+For an ingredient that never appeared with the cuisine the count is just 0, so it gets
+prior/(total + prior * number of ingredients) - the same number the dense table would have held.
+"""
+
+"""
+Input:
+	data -> List of recipes
+	all_ingredients -> set of every ingredient in the training data
+	prior -> the starting count every (cuisine, ingredient) pair gets, 0.15 in robust_naive_bayes_example
+Output: The smoothed counts
+
+Form of Output:
+	smoothed = {
+	'counts': {u'vietnamese': {u'fish sauce': 212, u'rice noodles': 90, ...},
+			   u'indian': {u'garam masala': 480, ...},
+			   ... },
+	'totals': {u'vietnamese': 6391.5, u'indian': 25000.5, ...},
+	'prior': 0.15,
+	'vocabulary': set of every ingredient in the training data
+	}
+
+	totals holds the denominator for each cuisine: the number of ingredients counted for it plus
+	prior * len(vocabulary).
+"""
+def get_smoothed_ingredient_counts(data, all_ingredients, prior=0.15):
+	counts = {}
+	# Count the number of times each ingredient occurs for a given cuisine
+	for recipe in data:
+		cuisine = recipe['cuisine']
+		cuisine_counts = counts.get(cuisine)
+		if cuisine_counts is None:
+			cuisine_counts = counts[cuisine] = {}
+		for ingredient in recipe['ingredients']:
+			cuisine_counts[ingredient] = cuisine_counts.get(ingredient, 0) + 1
+
+	smoothing = prior*len(all_ingredients)
+	totals = {cuisine : sum(counts[cuisine].values()) + smoothing for cuisine in counts}
+
+	return {'counts': counts, 'totals': totals, 'prior': prior, 'vocabulary': all_ingredients}
+
+"""
+Returns p(ingredient | cuisine) from the smoothed counts. Like get_max_cuisine in
+robust_naive_bayes_example, an ingredient we've never seen gets probability 1 so it's ignored.
+"""
+def get_ingredient_prob(ingredient, cuisine, smoothed):
+	if ingredient not in smoothed['vocabulary']:
+		return 1
+	return (smoothed['counts'][cuisine].get(ingredient, 0) + smoothed['prior'])/smoothed['totals'][cuisine]
+
+"""
+Input:
+	ingredient_list -> the list of ingredients from a new recipe we want to classify
+	cuisine_probs -> result of get_cuisine_probs(data)
+	smoothed -> result of get_smoothed_ingredient_counts(data, all_ingredients)
+Output:
+	String identifying most probable cuisine for the given ingredient list
+
+This is robust_naive_bayes_example.get_max_cuisine with the probabilities worked out from the counts.
+"""
+def get_max_cuisine(ingredient_list, cuisine_probs, smoothed):
+	vocabulary = smoothed['vocabulary']
+	prior = smoothed['prior']
+	# Ingredients we've never seen are ignored, so drop them before looping over the cuisines
+	ingredient_list = [ingredient for ingredient in ingredient_list if ingredient in vocabulary]
+
+	max_prob = 0
+	best_cuisine = None
+	for cuisine in cuisine_probs:
+		counts = smoothed['counts'][cuisine]
+		total = smoothed['totals'][cuisine]
+		prob = cuisine_probs[cuisine]
+		for ingredient in ingredient_list:
+			prob *= (counts.get(ingredient, 0) + prior)/total
+		if prob > max_prob:
+			max_prob = prob
+			best_cuisine = cuisine
+	return best_cuisine
+
+"""
+Builds a compiled model (see compiled_naive_bayes.compile_model) straight from the smoothed counts,
+without going through the dense dictionary. Unseen ingredients get log(1) = 0 so they're ignored.
+"""
+def compile_smoothed_model(cuisine_probs, smoothed):
+	cuisines = list(cuisine_probs)
+	ingredient_ids = {ingredient : i for (i, ingredient) in enumerate(smoothed['vocabulary'])}
+	counts = np.zeros((len(ingredient_ids) + 1, len(cuisines)), dtype=np.float64)
+	for j, cuisine in enumerate(cuisines):
+		for ingredient, count in smoothed['counts'].get(cuisine, {}).items():
+			counts[ingredient_ids[ingredient], j] = count
+
+	totals = np.array([smoothed['totals'][cuisine] for cuisine in cuisines], dtype=np.float64)
+	log_probs = np.log(counts + smoothed['prior']) - np.log(totals)
+	log_probs[-1] = 0
+	log_prior = np.log(np.array([cuisine_probs[cuisine] for cuisine in cuisines], dtype=np.float64))
+	return {'cuisines': cuisines, 'ingredient_ids': ingredient_ids, 'log_prior': log_prior, 'log_probs': log_probs}
+
+"""
+Same as test_classifier in robust_naive_bayes_example, but trains with get_smoothed_ingredient_counts.
+"""
+def test_classifier(train_file, prior=0.15):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+
+	cuisine_probs = get_cuisine_probs(train_data)
+	all_ingredients = set()
+	for recipe in train_data:
+		for ingredient in recipe['ingredients']:
+			all_ingredients.add(ingredient)
+	smoothed = get_smoothed_ingredient_counts(train_data, all_ingredients, prior)
+
+	results = []
+	for recipe in test_data:
+		cuisine = get_max_cuisine(recipe['ingredients'], cuisine_probs, smoothed)
+		results.append((cuisine, recipe['cuisine']))
+
+	return results
+
+"""
+Compares training with the dense 0.15 table against the smoothed counts: how long training takes, how
+much memory the trained model holds on to, and whether the two give the same answers on the held out
+recipes.
+"""
+def benchmark(train_file, prior=0.15):
+	data = load_data(train_file)
+	train_data = data[:-1000]
+	test_data = data[-1000:]
+	cuisine_probs = get_cuisine_probs(train_data)
+	all_cuisines = list(cuisine_probs)
+	all_ingredients = set(ingredient for recipe in train_data for ingredient in recipe['ingredients'])
+
+	def train_dense():
+		return robust_naive_bayes_example.get_ingredient_prob_given_cuisine(train_data, all_cuisines, all_ingredients)
+
+	def train_sparse():
+		return get_smoothed_ingredient_counts(train_data, all_ingredients, prior)
+
+	results = {}
+	models = {}
+	for name, train in (('dense', train_dense), ('sparse', train_sparse)):
+		start = default_timer()
+		models[name] = train()
+		elapsed = default_timer() - start
+
+		# Train again under tracemalloc to see how much memory the model keeps
+		models[name] = None
+		tracemalloc.start()
+		models[name] = train()
+		retained, peak = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		results[name] = {'train_time': elapsed, 'retained_bytes': retained, 'peak_bytes': peak}
+
+	dense = [robust_naive_bayes_example.get_max_cuisine(recipe['ingredients'], cuisine_probs, models['dense']) for recipe in test_data]
+	sparse = [get_max_cuisine(recipe['ingredients'], cuisine_probs, models['sparse']) for recipe in test_data]
+	truth = [recipe['cuisine'] for recipe in test_data]
+	results['dense']['accuracy'] = eval_classifier(list(zip(dense, truth)))
+	results['sparse']['accuracy'] = eval_classifier(list(zip(sparse, truth)))
+	results['disagreements'] = sum(a != b for (a, b) in zip(dense, sparse))
+
+	for name in ('dense', 'sparse'):
+		print('%-6s train %.3fs, model %.1f MB (peak %.1f MB), accuracy %.3f' % (name, results[name]['train_time'],
+			results[name]['retained_bytes']/1e6, results[name]['peak_bytes']/1e6, results[name]['accuracy']))
+	print('disagreements: %d' % results['disagreements'])
+	return results
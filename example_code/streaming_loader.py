@@ -0,0 +1,198 @@
+import json
+import os
+import resource
+from multiprocessing import Process, Queue
+from timeit import default_timer
+
+import naive_bayes_example
+from fused_trainer import NaiveBayesTrainer
+from naive_bayes_example import load_data
+"""
+load_data reads the whole file with json.load, so every recipe is turned into Python dictionaries and
+lists before we can do anything with them. That's fine for train.json, but for bigger files it takes a
+lot of memory (several times the size of the file) and a long time before training can start.
+
+iter_recipes reads the file a piece at a time and hands back one recipe at a time instead. Since
+get_cuisine_probs and get_ingredient_prob_given_cuisine only loop over the recipes once, you can pass
+the iterator straight to them, and only one recipe (plus a small read buffer) is in memory at a time.
+
+Both the normal format (one big JSON list, like train.json) and JSON Lines (one recipe per line) work.
+"""
+
+"""
+Input:
+	filename -> path to a JSON file holding a list of recipes, or a JSON Lines file
+	chunk_size -> how many characters to read from the file at a time
+Output:
+	A generator that yields the recipes one at a time, in the order they appear in the file
+"""
+def iter_recipes(filename, chunk_size=1 << 16):
+	with open(filename) as data_file:
+		first = data_file.read(1)
+		while first and first.isspace():
+			first = data_file.read(1)
+		if first == '[':
+			for recipe in _iter_json_array(data_file, chunk_size):
+				yield recipe
+		elif first:
+			# JSON Lines: we already read the first character of the first line
+			line = first + data_file.readline()
+			while line:
+				if line.strip():
+					yield json.loads(line)
+				line = data_file.readline()
+
+# A decode error this close to the end of the buffer might just mean the item continues in the next chunk
+# (half of "true", a \u escape or a number); further back it means the item is broken
+_LOOKBACK = 32
+
+def _incomplete(error, buffer):
+	return error.msg.startswith('Unterminated string') or len(buffer) - error.pos <= _LOOKBACK
+
+"""
+Yields the items of a JSON list whose opening '[' has already been read from data_file. The list must
+be valid JSON: items separated by exactly one comma, and no comma after the last one.
+
+When an item doesn't fit in the buffer, the buffer is at least doubled before trying again, so even a
+huge item is only decoded a few times, and a broken item is reported as soon as it's seen rather than
+after reading the rest of the file.
+"""
+def _iter_json_array(data_file, chunk_size):
+	decoder = json.JSONDecoder()
+	buffer = ''
+	pos = 0
+	# Characters dropped from the front of the buffer, so errors can say where in the file they are
+	offset = 1
+	eof = False
+	# 'first' (an item or ']'), 'item' (after a comma) or 'separator' (',' or ']')
+	expect = 'first'
+	while True:
+		while pos < len(buffer) and buffer[pos].isspace():
+			pos += 1
+
+		if pos < len(buffer):
+			char = buffer[pos]
+			if expect == 'separator':
+				if char == ']':
+					_check_end(data_file, buffer[pos + 1:], offset + pos + 1, chunk_size)
+					return
+				if char != ',':
+					raise ValueError("%s: expected ',' or ']' at character %d, found %r" % (data_file.name, offset + pos, char))
+				pos += 1
+				expect = 'item'
+				continue
+			if char == ']' and expect == 'first':
+				_check_end(data_file, buffer[pos + 1:], offset + pos + 1, chunk_size)
+				return
+			if char in ',]':
+				raise ValueError('%s: expected a list item at character %d, found %r' % (data_file.name, offset + pos, char))
+
+			try:
+				item, end = decoder.raw_decode(buffer, pos)
+			except json.JSONDecodeError as error:
+				if eof or not _incomplete(error, buffer):
+					raise ValueError('%s: invalid list item at character %d: %s' % (data_file.name, offset + error.pos, error.msg))
+				end = None
+			# If the item runs right up to the end of the buffer it might continue in the next chunk
+			# (a number, say), so only trust it once we've seen what comes after it
+			if end is not None and (end < len(buffer) or eof):
+				yield item
+				pos = end
+				expect = 'separator'
+				continue
+
+		if eof:
+			raise ValueError('%s ended in the middle of a JSON list' % data_file.name)
+		offset += pos
+		buffer = buffer[pos:]
+		pos = 0
+		wanted = len(buffer) + max(chunk_size, len(buffer))
+		while len(buffer) < wanted:
+			chunk = data_file.read(max(chunk_size, wanted - len(buffer)))
+			if not chunk:
+				eof = True
+				break
+			buffer += chunk
+
+"""
+Raises a ValueError, like json.load does, if anything but whitespace follows the closing ']' of the list.
+rest is what was left in the buffer after the ']', which starts at character offset in the file.
+"""
+def _check_end(data_file, rest, offset, chunk_size):
+	while True:
+		stripped = rest.lstrip()
+		if stripped:
+			raise ValueError('%s: extra data after the JSON list at character %d' % (data_file.name, offset + len(rest) - len(stripped)))
+		offset += len(rest)
+		rest = data_file.read(chunk_size)
+		if not rest:
+			return
+
+"""
+Trains naive_bayes_example's classifier straight from a file without ever loading the whole thing.
+fused_trainer.NaiveBayesTrainer collects what get_cuisine_probs and get_ingredient_prob_given_cuisine
+need in one go, so the file is only read and parsed once.
+
+Output:
+	(cuisine_probs, ingredient_prob_given_cuisine)
+"""
+def train_from_file(filename):
+	trainer = NaiveBayesTrainer().fit(iter_recipes(filename))
+	return trainer.get_cuisine_probs(), trainer.get_ingredient_prob_given_cuisine()
+
+"""
+Writes a bigger copy of a recipe file for benchmarking, by repeating its recipes copies times. With
+json_lines=True it writes one recipe per line instead of one big list.
+"""
+def make_large_file(source_file, filename, copies, json_lines=False):
+	data = load_data(source_file)
+	with open(filename, 'w') as out:
+		if not json_lines:
+			out.write('[\n')
+		first = True
+		for _ in range(copies):
+			for recipe in data:
+				if json_lines:
+					out.write(json.dumps(recipe) + '\n')
+				else:
+					out.write(('' if first else ',\n') + json.dumps(recipe))
+					first = False
+		if not json_lines:
+			out.write('\n]\n')
+
+def _train_with_load_data(filename):
+	data = load_data(filename)
+	return naive_bayes_example.get_cuisine_probs(data), naive_bayes_example.get_ingredient_prob_given_cuisine(data)
+
+def _measure(train, filename, queue):
+	try:
+		start = default_timer()
+		train(filename)
+		elapsed = default_timer() - start
+	except Exception as error:
+		# Always answer, or the parent waits on the queue forever
+		queue.put(('error', repr(error)))
+		return
+	# ru_maxrss is in kilobytes on Linux
+	queue.put(('ok', elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024))
+
+"""
+Trains from filename with load_data and with iter_recipes, each in a fresh process so we can compare
+the time taken and the peak memory (resident set size) of each. Use make_large_file to get a file big
+enough to see the difference. If training fails in either process, the error is raised here as a
+RuntimeError (load_data can't read JSON Lines files, for example).
+"""
+def benchmark(filename):
+	results = {'file_bytes': os.path.getsize(filename)}
+	for name, train in (('load_data', _train_with_load_data), ('iter_recipes', train_from_file)):
+		queue = Queue()
+		process = Process(target=_measure, args=(train, filename, queue))
+		process.start()
+		result = queue.get()
+		process.join()
+		if result[0] == 'error':
+			raise RuntimeError('training with %s failed: %s' % (name, result[1]))
+		elapsed, peak_rss = result[1:]
+		results[name] = {'train_time': elapsed, 'peak_rss_bytes': peak_rss}
+		print('%-12s %.2fs, peak RSS %.1f MB (file is %.1f MB)' % (name, elapsed, peak_rss/1e6, results['file_bytes']/1e6))
+	return results